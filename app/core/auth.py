@@ -1,15 +1,135 @@
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from supabase import Client
+from supabase import AsyncClient
+from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.permissions import memberships
 from app.database import get_supabase
+import hashlib
+import asyncio
+import time
+import httpx
 import re
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(supabase: Client = Depends(get_supabase), token: str = Depends(oauth2_scheme)):
+# Cache principal hasil verifikasi, key = hash token (token asli tidak disimpan)
+token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+JWKS_URL = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+JWKS_REFRESH_INTERVAL = 60
+# Algoritma yang diterima ditentukan server, bukan header token (yang belum terverifikasi)
+SECRET_ALGORITHMS = ["HS256"]
+JWKS_ALGORITHMS = {"RSA": ["RS256"], "EC": ["ES256"]}
+
+_jwks = {}
+_jwks_fetched_at = 0.0
+_jwks_lock = asyncio.Lock()
+
+class UnknownKeyError(Exception):
+    pass
+
+def _principal_from_claims(claims: dict) -> dict:
+    return {
+        "id": claims["sub"],
+        "email": claims.get("email"),
+        "role": claims.get("role"),
+        "session_id": claims.get("session_id"),
+        "app_metadata": claims.get("app_metadata", {}),
+        "user_metadata": claims.get("user_metadata", {}),
+    }
+
+def _principal_from_user(user) -> dict:
+    return {
+        "id": user.id,
+        "email": user.email,
+        "role": user.role,
+        "session_id": None,
+        "app_metadata": user.app_metadata or {},
+        "user_metadata": user.user_metadata or {},
+    }
+
+async def _signing_key(kid: str):
+    global _jwks, _jwks_fetched_at
+    async with _jwks_lock:
+        if kid not in _jwks and time.monotonic() - _jwks_fetched_at > JWKS_REFRESH_INTERVAL:
+            # Key baru (rotasi) -> ambil ulang JWKS, dibatasi sekali per interval
+            _jwks_fetched_at = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=5) as client:
+                    keys = (await client.get(JWKS_URL)).json().get("keys", [])
+                _jwks = {key["kid"]: key for key in keys if "kid" in key}
+            except (httpx.HTTPError, ValueError):
+                pass
+        if kid not in _jwks:
+            raise UnknownKeyError(kid)
+        return _jwks[kid]
+
+def _key_algorithms(key: dict) -> list:
+    # Daftar algoritma sesuai tipe key JWKS, dipersempit ke "alg" key jika ada
+    algorithms = JWKS_ALGORITHMS.get(key.get("kty"), [])
+    if key.get("alg"):
+        algorithms = [algorithm for algorithm in algorithms if algorithm == key["alg"]]
+    if not algorithms:
+        raise JWTError(f"Unsupported signing key {key.get('kid')}")
+    return algorithms
+
+async def verify_token(token: str) -> dict:
+    header = jwt.get_unverified_header(token)
+    # Header hanya dipakai memilih sumber key; algoritma di-pin per sumber
+    if header.get("alg") in SECRET_ALGORITHMS:
+        if not settings.SUPABASE_JWT_SECRET:
+            raise UnknownKeyError(None)
+        key, algorithms = settings.SUPABASE_JWT_SECRET, SECRET_ALGORITHMS
+    else:
+        key = await _signing_key(header.get("kid"))
+        algorithms = _key_algorithms(key)
+    # Cek signature, exp dan audience secara lokal
+    return jwt.decode(token, key, algorithms=algorithms, audience=settings.SUPABASE_JWT_AUDIENCE)
+
+async def _verify_remote(supabase: AsyncClient, token: str) -> dict:
+    response = await supabase.auth.get_user(token)
+    if not response or not response.user:
+        raise HTTPException(401, "Invalid token")
+    return _principal_from_user(response.user)
+
+async def get_current_user(supabase: AsyncClient = Depends(get_supabase), token: str = Depends(oauth2_scheme)):
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = token_cache.get(key)
+    now = time.time()
+    if cached is not None:
+        principal, checked_at = cached
+        if not settings.AUTH_REVOCATION_CHECK_SECONDS or now - checked_at < settings.AUTH_REVOCATION_CHECK_SECONDS:
+            return principal
+
     try:
-        user = supabase.auth.get_user(token)
-        return user.data.user
+        remote = cached is not None
+        try:
+            claims = await verify_token(token)
+            principal = _principal_from_claims(claims)
+            ttl = min(settings.AUTH_CACHE_TTL, claims["exp"] - now)
+        except UnknownKeyError:
+            # kid tidak dikenal -> fallback ke server auth
+            remote = True
+            ttl = settings.AUTH_CACHE_TTL
+        if remote:
+            # Juga dipakai untuk cek revocation berkala pada token yang sudah di-cache
+            principal = await _verify_remote(supabase, token)
+    except HTTPException:
+        raise
     except Exception:
-        raise HTTPException(401, "Invalid token")
\ No newline at end of file
+        raise HTTPException(401, "Invalid token")
+
+    if ttl > 0:
+        token_cache.set(key, (principal, now), ttl=ttl)
+    return principal
+
+async def has_permission(current_user: dict, workspace_id, supabase: AsyncClient) -> bool:
+    return await memberships.is_member(supabase, current_user["id"], workspace_id)
+
+async def require_admin(current_user: dict = Depends(get_current_user), supabase: AsyncClient = Depends(get_supabase)) -> dict:
+    # Endpoint internal (/metrics/*) hanya untuk admin
+    if await memberships.get_role(supabase, current_user["id"]) != "admin":
+        raise HTTPException(403, "Forbidden")
+    return current_user
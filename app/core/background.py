@@ -0,0 +1,43 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    def __init__(self, name: str, interval: float, func, run_at_start: bool = False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_at_start = run_at_start
+        self.runs = 0
+        self.failures = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_once(self):
+        try:
+            await self.func()
+            self.runs += 1
+        except Exception:
+            # Job gagal tidak boleh mematikan loop, coba lagi di interval berikutnya
+            self.failures += 1
+            logger.exception("Background task %s failed", self.name)
+
+    async def _run(self):
+        if not self.run_at_start:
+            await asyncio.sleep(self.interval)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"interval": self.interval, "runs": self.runs, "failures": self.failures}
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+async def gather_with_deadline(queries: dict, deadline: float):
+    # Jalankan semua query bersamaan; yang gagal / lewat deadline dilaporkan di errors
+    results, timings, errors = {}, {}, {}
+
+    async def run(name, awaitable):
+        start = time.perf_counter()
+        try:
+            results[name] = await awaitable
+        except Exception as e:
+            errors[name] = str(e) or e.__class__.__name__
+        finally:
+            timings[name] = (time.perf_counter() - start) * 1000
+
+    tasks = {name: asyncio.ensure_future(run(name, awaitable)) for name, awaitable in queries.items()}
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    for name, task in tasks.items():
+        if task in pending:
+            errors[name] = "timeout"
+    return results, timings, errors
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
@@ -2,9 +2,74 @@ from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     SUPABASE_URL: str
-    SUPABASE_URL_ROLE_KEY: str
-    
+    SUPABASE_SERVICE_ROLE_KEY: str
+
+    # Pool client Supabase (per worker)
+    SUPABASE_POOL_SIZE: int = 50
+    SUPABASE_POOL_TIMEOUT: float = 5.0
+
+    # Verifikasi JWT lokal
+    SUPABASE_JWT_SECRET: str = None
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: int = 300
+    AUTH_REVOCATION_CHECK_SECONDS: int = 0
+
+    # Cache membership & role workspace
+    MEMBERSHIP_CACHE_SIZE: int = 10000
+    MEMBERSHIP_CACHE_TTL: int = 60
+
+    # Batas waktu total sub-query dashboard analytics
+    ANALYTICS_DEADLINE_SECONDS: float = 2.0
+
+    # Interval hitung ulang tabel workspace_metrics
+    METRICS_RECONCILE_SECONDS: int = 900
+
+    # Cache kolom histori payroll untuk simulasi (per workspace)
+    PAYROLL_HISTORY_CACHE_SIZE: int = 32
+    PAYROLL_HISTORY_CACHE_TTL: int = 600
+
+    # Cache id referensi (contact, customer, project, ...) untuk validasi tulis
+    REFERENCE_CACHE_SIZE: int = 50000
+    REFERENCE_CACHE_TTL: int = 30
+
+    # Job expiry kontrak per workspace
+    CONTRACT_EXPIRY_BATCH_SIZE: int = 500
+    CONTRACT_EXPIRY_MAX_BATCHES: int = 20
+    CONTRACT_EXPIRY_QUEUE_SECONDS: int = 5
+    CONTRACT_EXPIRY_SWEEP_SECONDS: int = 3600
+
+    # Scheduler jatuh tempo invoice (pending -> overdue + pengingat)
+    INVOICE_SCHEDULER_SECONDS: int = 60
+    INVOICE_SCHEDULER_RELOAD_SECONDS: int = 3600
+    INVOICE_SCHEDULER_BATCH_SIZE: int = 500
+    INVOICE_REMINDER_DAYS: int = 3
+    # Lease scheduler (hanya satu worker yang aktif); diperpanjang setiap tick
+    INVOICE_SCHEDULER_LEASE_SECONDS: int = 180
+
+    # Roll-forward harian bucket aging invoice
+    INVOICE_AGING_ROLL_SECONDS: int = 86400
+
+    # Cache rekap keuangan project (portfolio per workspace)
+    PROJECT_FINANCIALS_CACHE_SIZE: int = 256
+    PROJECT_FINANCIALS_CACHE_TTL: int = 60
+
+    # Deteksi duplikat customer & kontak CRM (skor 0..1)
+    DEDUP_THRESHOLD: float = 0.85
+    DEDUP_MAX_BUCKET_SIZE: int = 200
+
+    # Import CSV massal (customers, kontak CRM, employees): baris per insert
+    IMPORT_CHUNK_SIZE: int = 500
+
+    # Cache respons GET + ETag (projects, contracts, invoices, analytics)
+    RESPONSE_CACHE_SIZE: int = 2048
+    RESPONSE_CACHE_TTL: int = 15
+
+    # Render slip gaji massal (None = jumlah CPU)
+    PAYSLIP_WORKERS: int = None
+    PAYSLIP_BATCH_SIZE: int = 100
+
     class Config:
         env_file = ".env"
-        
+
 settings = Settings()
\ No newline at end of file
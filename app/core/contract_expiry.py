@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from datetime import date, datetime
+from supabase import AsyncClient
+from app.core.config import settings
+from app.core.pagination import keyset, page
+from app.core.response_cache import response_cache
+from app.database import pool
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_CHUNK_SIZE = 1000
+
+class ContractExpiryQueue:
+    def __init__(self, batch_size: int, max_batches: int):
+        self.batch_size = batch_size
+        # Batas batch per giliran supaya satu workspace besar tidak memonopoli job
+        self.max_batches = max_batches
+        self._queue = asyncio.Queue()
+        self._queued = set()
+        self.last_runs = {}
+        self.processed = 0
+        self.expired = 0
+
+    def enqueue(self, workspace_id: int) -> bool:
+        if workspace_id in self._queued:
+            return False
+        self._queued.add(workspace_id)
+        self._queue.put_nowait(workspace_id)
+        return True
+
+    async def expire_workspace(self, supabase: AsyncClient, workspace_id: int) -> dict:
+        today = date.today().isoformat()
+        expired, result = 0, {}
+        for _ in range(self.max_batches):
+            result = (await supabase.rpc("expire_contracts", {
+                "p_workspace_id": workspace_id,
+                "p_today": today,
+                "p_batch_size": self.batch_size
+            }).execute()).data
+            expired += result["expired"]
+            if not result["has_more"]:
+                break
+        return {
+            "expired": expired,
+            "has_more": result.get("has_more", False),
+            "finished_at": datetime.now().isoformat()
+        }
+
+    async def drain(self):
+        if self._queue.empty():
+            return
+        async with pool.connection() as supabase:
+            while not self._queue.empty():
+                workspace_id = self._queue.get_nowait()
+                self._queued.discard(workspace_id)
+                try:
+                    run = await self.expire_workspace(supabase, workspace_id)
+                except Exception:
+                    logger.exception("Contract expiry failed for workspace %s", workspace_id)
+                    continue
+                self.last_runs[workspace_id] = run
+                self.processed += 1
+                self.expired += run["expired"]
+                if run["expired"]:
+                    response_cache.bump(workspace_id, "contracts")
+                if run["has_more"]:
+                    # Masih ada sisa: antre lagi di belakang workspace lain
+                    self.enqueue(workspace_id)
+
+    async def enqueue_all(self):
+        # Sapuan berkala: antrekan semua workspace (index parsial membuat run murah)
+        async with pool.connection() as supabase:
+            cursor = None
+            while True:
+                query = supabase.table("workspaces").select("id")
+                response = await keyset(query, "id", cursor, WORKSPACE_CHUNK_SIZE).execute()
+                result = page(response.data, "id", WORKSPACE_CHUNK_SIZE)
+                for row in result["data"]:
+                    self.enqueue(row["id"])
+                cursor = result["next_cursor"]
+                if not cursor:
+                    break
+        await self.drain()
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "processed": self.processed, "expired": self.expired}
+
+contract_expiry = ContractExpiryQueue(settings.CONTRACT_EXPIRY_BATCH_SIZE, settings.CONTRACT_EXPIRY_MAX_BATCHES)
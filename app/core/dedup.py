@@ -0,0 +1,239 @@
+import asyncio
+import re
+import string
+from difflib import SequenceMatcher
+from supabase import AsyncClient
+from app.core.config import settings
+from app.core.pagination import keyset, page
+
+DEDUP_TABLES = ("customers", "crm_contacts")
+DEDUP_COLUMNS = "id, name, email, phone, company"
+LOAD_CHUNK_SIZE = 1000
+MATCH_CHUNK_SIZE = 500
+# Domain email umum tidak dipakai sebagai blok (terlalu besar, tidak bermakna)
+FREE_EMAIL_DOMAINS = {"gmail.com", "yahoo.com", "yahoo.co.id", "hotmail.com", "outlook.com", "icloud.com", "ymail.com"}
+COMPANY_SUFFIXES = {"pt", "cv", "tbk", "inc", "ltd", "llc", "corp", "co"}
+# Spasi di awal/akhir email: whitespace ASCII, NBSP, spasi Unicode & zero-width.
+# Daftar karakter eksplisit (bukan str.strip / btrim) supaya Python dan SQL identik
+_TRIM_CHARS = r"[\t\n\v\f\r \u0085\u00a0\u1680\u2000-\u200b\u2028\u2029\u202f\u205f\u3000\ufeff]"
+EMAIL_TRIM_PATTERN = rf"^{_TRIM_CHARS}+|{_TRIM_CHARS}+$"
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+    "l": "4", **dict.fromkeys("mn", "5"), "r": "6"
+}
+
+def normalize_email(email) -> str:
+    # Sama persis dengan kolom generated email_normalized (migrasi contact_dedup):
+    # trim karakter di EMAIL_TRIM_PATTERN, lalu huruf kecil ASCII saja
+    email = re.sub(EMAIL_TRIM_PATTERN, "", email or "")
+    return email.translate(_ASCII_LOWER) or None
+
+def normalize_phone(phone) -> str:
+    # Sama dengan kolom generated phone_digits: digit saja, +62 -> 0
+    digits = re.sub(r"[^0-9]", "", phone or "")
+    if digits.startswith("62"):
+        digits = "0" + digits[2:]
+    return digits or None
+
+# Kunci cek duplikat saat insert -> (kolom generated, fungsi normalisasi)
+MATCH_KEYS = {
+    "email": ("email_normalized", normalize_email),
+    "phone": ("phone_digits", normalize_phone)
+}
+
+def normalize_name(name) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", (name or "").lower()).split())
+
+def normalize_company(company) -> str:
+    return " ".join(word for word in normalize_name(company).split() if word not in COMPANY_SUFFIXES)
+
+def soundex(word: str) -> str:
+    word = "".join(ch for ch in word.lower() if "a" <= ch <= "z")
+    if not word:
+        return ""
+    code, last = word[0].upper(), _SOUNDEX_CODES.get(word[0])
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch)
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+def prepare(table: str, row: dict) -> dict:
+    name = normalize_name(row.get("name"))
+    email = normalize_email(row.get("email"))
+    words = name.split()
+    return {
+        "type": table,
+        "id": str(row["id"]),
+        "name": row.get("name"),
+        "email": row.get("email"),
+        "phone": row.get("phone"),
+        "company": row.get("company"),
+        "_name": name,
+        "_email": email,
+        "_phone": normalize_phone(row.get("phone")),
+        "_company": normalize_company(row.get("company")),
+        "_domain": email.rsplit("@", 1)[-1] if email and "@" in email else None,
+        "_sounds": "".join(soundex(word) for word in words[:1] + words[-1:]) if words else None
+    }
+
+def blocking_keys(record: dict) -> set:
+    # Pasangan hanya dibandingkan di dalam blok yang sama
+    keys = set()
+    if record["_email"]:
+        keys.add(("email", record["_email"]))
+    if record["_phone"]:
+        keys.add(("phone", record["_phone"]))
+    if record["_sounds"]:
+        keys.add(("name", record["_sounds"]))
+        if record["_domain"] and record["_domain"] not in FREE_EMAIL_DOMAINS:
+            keys.add(("domain", record["_domain"], record["_sounds"][:4]))
+        if record["_company"]:
+            keys.add(("company", record["_company"], record["_sounds"][:4]))
+    return keys
+
+def score(a: dict, b: dict) -> tuple:
+    reasons = []
+    if a["_email"] and a["_email"] == b["_email"]:
+        reasons.append("email")
+    if a["_phone"] and a["_phone"] == b["_phone"]:
+        reasons.append("phone")
+    similarity = SequenceMatcher(None, a["_name"], b["_name"]).ratio()
+    same_org = bool(
+        (a["_company"] and a["_company"] == b["_company"])
+        or (a["_domain"] and a["_domain"] == b["_domain"] and a["_domain"] not in FREE_EMAIL_DOMAINS)
+    )
+    if similarity >= 0.9:
+        reasons.append("name")
+    if same_org:
+        reasons.append("company")
+    value = similarity * 0.8 + (0.2 if same_org else 0.0)
+    if "phone" in reasons:
+        value = max(value, 0.9)
+    if "email" in reasons:
+        value = 1.0
+    return round(value, 3), reasons
+
+def find_duplicates(records: list, threshold: float, max_bucket_size: int) -> dict:
+    buckets = {}
+    for index, record in enumerate(records):
+        for key in blocking_keys(record):
+            buckets.setdefault(key, []).append(index)
+
+    pairs, seen, truncated = [], set(), []
+    for key, members in buckets.items():
+        if len(members) < 2:
+            continue
+        # Blok nama/domain yang terlalu besar dilewati supaya tetap mendekati linear,
+        # tapi dilaporkan: kandidat di dalamnya mungkin terlewat
+        if len(members) > max_bucket_size and key[0] not in ("email", "phone"):
+            truncated.append({"block": key[0], "key": list(key[1:]), "records": len(members)})
+            continue
+        for i, left in enumerate(members):
+            for right in members[i + 1:]:
+                if (left, right) in seen:
+                    continue
+                seen.add((left, right))
+                value, reasons = score(records[left], records[right])
+                if value >= threshold:
+                    pairs.append((left, right, value, reasons))
+
+    # Gabungkan pasangan jadi kelompok (union-find)
+    parent = list(range(len(records)))
+    def root(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+    for left, right, _, _ in pairs:
+        parent[root(left)] = root(right)
+    groups = {}
+    for left, right, _, _ in pairs:
+        groups.setdefault(root(left), set()).update((left, right))
+
+    def public(index):
+        return {key: value for key, value in records[index].items() if not key.startswith("_")}
+    pairs.sort(key=lambda pair: -pair[2])
+    truncated.sort(key=lambda bucket: -bucket["records"])
+    return {
+        "pairs": [{"a": public(left), "b": public(right), "score": value, "reasons": reasons} for left, right, value, reasons in pairs],
+        "groups": [[public(index) for index in sorted(members)] for members in groups.values()],
+        "truncated": bool(truncated),
+        "truncated_buckets": truncated,
+        "stats": {
+            "records": len(records),
+            "buckets": len(buckets),
+            "skipped_buckets": len(truncated),
+            "max_bucket_size": max_bucket_size,
+            "comparisons": len(seen)
+        }
+    }
+
+async def _load(supabase: AsyncClient, table: str, workspace_id: int) -> list:
+    rows, cursor = [], None
+    while True:
+        query = supabase.table(table).select(DEDUP_COLUMNS).eq("workspace_id", workspace_id)
+        response = await keyset(query, "id", cursor, LOAD_CHUNK_SIZE).execute()
+        result = page(response.data, "id", LOAD_CHUNK_SIZE)
+        rows += [prepare(table, row) for row in result["data"]]
+        cursor = result["next_cursor"]
+        if not cursor:
+            return rows
+
+async def scan_workspace(supabase: AsyncClient, workspace_id: int, tables=DEDUP_TABLES, threshold: float = None) -> dict:
+    loaded = await asyncio.gather(*(_load(supabase, table, workspace_id) for table in tables))
+    records = [record for rows in loaded for record in rows]
+    # Pencocokan CPU-bound dijalankan di thread supaya event loop tetap responsif
+    return await asyncio.to_thread(
+        find_duplicates,
+        records,
+        threshold if threshold is not None else settings.DEDUP_THRESHOLD,
+        settings.DEDUP_MAX_BUCKET_SIZE
+    )
+
+def match_keys(row: dict, keys=("email", "phone")) -> list:
+    # [(kunci, nilai ter-normalisasi)] yang dipakai untuk cek duplikat saat insert
+    values = []
+    for key in keys:
+        value = MATCH_KEYS[key][1](row.get(key))
+        if value:
+            values.append((key, value))
+    return values
+
+async def find_matches(supabase: AsyncClient, workspace_id: int, tables=DEDUP_TABLES, email: str = None, phone: str = None) -> list:
+    # Cek saat insert: lookup index email_normalized / phone_digits, tanpa memuat workspace
+    keys = match_keys({"email": email, "phone": phone})
+    lookups = [(table, key, value) for table in tables for key, value in keys]
+    responses = await asyncio.gather(*(
+        supabase.table(table).select(DEDUP_COLUMNS).eq("workspace_id", workspace_id).eq(MATCH_KEYS[key][0], value).limit(10).execute()
+        for table, key, value in lookups
+    ))
+    matches = {}
+    for (table, key, _), response in zip(lookups, responses):
+        for row in response.data:
+            match = matches.setdefault((table, str(row["id"])), {"type": table, **row, "matched": []})
+            match["matched"].append(key)
+    return list(matches.values())
+
+async def find_existing(supabase: AsyncClient, workspace_id: int, table: str, values: list) -> set:
+    # Versi massal find_matches untuk import: values = hasil match_keys banyak baris,
+    # dicek dengan in_() per potongan; dikembalikan pasangan (kunci, nilai) yang sudah ada
+    by_key = {}
+    for key, value in values:
+        by_key.setdefault(key, set()).add(value)
+    lookups = [
+        (key, sorted(found)[start:start + MATCH_CHUNK_SIZE])
+        for key, found in by_key.items()
+        for start in range(0, len(found), MATCH_CHUNK_SIZE)
+    ]
+    responses = await asyncio.gather(*(
+        supabase.table(table).select(MATCH_KEYS[key][0]).eq("workspace_id", workspace_id).in_(MATCH_KEYS[key][0], chunk).execute()
+        for key, chunk in lookups
+    ))
+    return {(key, row[MATCH_KEYS[key][0]]) for (key, _), response in zip(lookups, responses) for row in response.data}
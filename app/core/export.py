@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from fastapi.responses import StreamingResponse
+from app.core.pagination import keyset, page
+from app.database import pool
+
+EXPORT_CHUNK_SIZE = 1000
+FLUSH_BYTES = 64 * 1024
+
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+async def iter_rows(build_query, sort_key: str = "id", chunk_size: int = EXPORT_CHUNK_SIZE):
+    # Koneksi sendiri: body streaming tetap jalan setelah dependency request ditutup
+    async with pool.connection() as supabase:
+        cursor = None
+        while True:
+            response = await keyset(build_query(supabase), sort_key, cursor, chunk_size).execute()
+            result = page(response.data, sort_key, chunk_size)
+            for row in result["data"]:
+                yield row
+            cursor = result["next_cursor"]
+            if not cursor:
+                return
+
+async def ndjson_chunks(rows):
+    buffer = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, default=str) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+async def csv_chunks(rows, columns: list):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_response(rows, format: str, columns: list, filename: str) -> StreamingResponse:
+    if format == "csv":
+        body, media_type = csv_chunks(rows, columns), "text/csv"
+    else:
+        body, media_type = ndjson_chunks(rows), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
@@ -0,0 +1,111 @@
+import asyncio
+import codecs
+import csv
+from itertools import islice
+from fastapi import HTTPException, UploadFile
+from postgrest.types import ReturnMethod
+from supabase import AsyncClient
+from app.core import dedup
+from app.core.config import settings
+
+# Tabel tujuan -> kolom CSV yang diterima, kolom wajib, nilai default, dan kunci cek
+# duplikat (dedup.match_keys) yang sama dengan endpoint create masing-masing
+IMPORT_SPECS = {
+    "customers": {
+        "columns": ("name", "email", "phone", "address", "company"),
+        "required": ("name", "email"),
+        "defaults": {},
+        "match": ("email",)
+    },
+    "crm_contacts": {
+        "columns": ("name", "email", "phone", "company", "lead_status", "source"),
+        "required": ("name", "email"),
+        "defaults": {"lead_status": "prospect", "source": "import"},
+        "match": ("email", "phone")
+    },
+    "employees": {
+        "columns": ("name", "position"),
+        "required": ("name", "position"),
+        "defaults": {},
+        "match": ()
+    }
+}
+
+def _reader(upload: UploadFile):
+    # UploadFile sudah di-spool ke file sementara; dibaca baris demi baris, tidak dimuat utuh
+    upload.file.seek(0)
+    reader = csv.DictReader(codecs.getreader("utf-8-sig")(upload.file, errors="replace"))
+    if not reader.fieldnames:
+        raise HTTPException(400, "CSV file is empty")
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    return reader
+
+def _validate(spec: dict, row: dict) -> tuple:
+    payload = {}
+    for column in spec["columns"]:
+        value = (row.get(column) or "").strip()
+        if value:
+            payload[column] = value
+    missing = [column for column in spec["required"] if column not in payload]
+    if missing:
+        return None, f"Missing {', '.join(missing)}"
+    # Satu statement insert harus punya kolom yang sama untuk semua baris
+    payload = {column: payload.get(column, spec["defaults"].get(column)) for column in spec["columns"]}
+    return payload, None
+
+async def import_csv(supabase: AsyncClient, workspace_id: int, table: str, upload: UploadFile, chunk_size: int = None) -> dict:
+    spec = IMPORT_SPECS[table]
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    reader = await asyncio.to_thread(_reader, upload)
+    total, imported, errors, seen = 0, 0, [], set()
+
+    while True:
+        # Parsing CSV (blocking I/O) per potongan di thread
+        batch = await asyncio.to_thread(lambda: list(islice(reader, chunk_size)))
+        if not batch:
+            break
+        rows = []
+        for index, row in enumerate(batch, start=total):
+            payload, error = _validate(spec, row)
+            if error:
+                errors.append({"index": index, "error": error})
+                continue
+            keys = dedup.match_keys(payload, spec["match"])
+            duplicate = next((key for key, value in keys if (key, value) in seen), None)
+            if duplicate:
+                errors.append({"index": index, "error": f"Duplicate {duplicate} in file"})
+                continue
+            seen.update(keys)
+            payload["workspace_id"] = workspace_id
+            rows.append((index, payload, keys))
+        total += len(batch)
+
+        if spec["match"] and rows:
+            # Satu lookup per kunci per potongan, bukan satu query per baris
+            existing = await dedup.find_existing(
+                supabase, workspace_id, table, [pair for _, _, keys in rows for pair in keys]
+            )
+            remaining = []
+            for index, payload, keys in rows:
+                duplicate = next((key for key, value in keys if (key, value) in existing), None)
+                if duplicate:
+                    errors.append({"index": index, "error": f"{duplicate.capitalize()} already exists"})
+                else:
+                    remaining.append((index, payload, keys))
+            rows = remaining
+        if not rows:
+            continue
+        try:
+            await supabase.table(table).insert([payload for _, payload, _ in rows], returning=ReturnMethod.minimal).execute()
+            imported += len(rows)
+        except Exception as e:
+            message = f"Insert failed: {getattr(e, 'message', None) or e}"
+            errors.extend({"index": index, "error": message} for index, _, _ in rows)
+
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "total": total,
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors
+    }
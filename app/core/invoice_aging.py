@@ -0,0 +1,72 @@
+import logging
+from datetime import date
+from supabase import AsyncClient
+from app.core.pagination import keyset, page
+from app.database import pool
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("current", "1_30", "31_60", "61_90", "90_plus")
+WORKSPACE_CHUNK_SIZE = 1000
+
+async def rebuild(supabase: AsyncClient, workspace_id: int):
+    await supabase.rpc("rebuild_invoice_aging", {
+        "p_workspace_id": workspace_id,
+        "p_as_of": date.today().isoformat()
+    }).execute()
+
+def _empty_buckets() -> dict:
+    return {bucket: {"count": 0, "amount": 0.0} for bucket in BUCKETS}
+
+def _summary(buckets: dict) -> dict:
+    return {"buckets": buckets, "total": sum(bucket["amount"] for bucket in buckets.values())}
+
+def _group(rows: list) -> dict:
+    groups = {}
+    for row in rows:
+        buckets = groups.setdefault(row["dimension_id"], _empty_buckets())
+        buckets[row["bucket"]] = {"count": row["invoice_count"], "amount": float(row["amount"])}
+    return groups
+
+async def get_report(supabase: AsyncClient, workspace_id: int) -> dict:
+    rows = (await supabase.rpc("invoice_aging_rows", {"p_workspace_id": workspace_id}).execute()).data
+    # Belum pernah dibangun / belum digulir hari ini -> bangun ulang workspace ini dulu
+    if not rows or rows[0]["as_of"] < date.today().isoformat():
+        await rebuild(supabase, workspace_id)
+        rows = (await supabase.rpc("invoice_aging_rows", {"p_workspace_id": workspace_id}).execute()).data
+
+    by_dimension = {"workspace": [], "customer": [], "project": []}
+    for row in rows:
+        by_dimension[row["dimension"]].append(row)
+    customers = _group(by_dimension["customer"])
+    projects = _group(by_dimension["project"])
+    return {
+        "as_of": rows[0]["as_of"] if rows else date.today().isoformat(),
+        "buckets": list(BUCKETS),
+        "workspace": _summary(_group(by_dimension["workspace"]).get("", _empty_buckets())),
+        "customers": sorted(
+            ({"customer_id": id, **_summary(buckets)} for id, buckets in customers.items()),
+            key=lambda group: -group["total"]
+        ),
+        "projects": sorted(
+            ({"project_id": id, **_summary(buckets)} for id, buckets in projects.items()),
+            key=lambda group: -group["total"]
+        )
+    }
+
+async def roll_forward_all():
+    # Job harian: hitung ulang bucket semua workspace dengan tanggal hari ini
+    async with pool.connection() as supabase:
+        cursor = None
+        while True:
+            query = supabase.table("workspaces").select("id")
+            response = await keyset(query, "id", cursor, WORKSPACE_CHUNK_SIZE).execute()
+            result = page(response.data, "id", WORKSPACE_CHUNK_SIZE)
+            for row in result["data"]:
+                try:
+                    await rebuild(supabase, row["id"])
+                except Exception:
+                    logger.exception("Failed to roll forward invoice_aging for workspace %s", row["id"])
+            cursor = result["next_cursor"]
+            if not cursor:
+                break
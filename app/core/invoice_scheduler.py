@@ -0,0 +1,183 @@
+import heapq
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import date, timedelta
+from postgrest.types import ReturnMethod
+from supabase import AsyncClient
+from app.core.config import settings
+from app.core.pagination import keyset, page
+from app.core.response_cache import response_cache
+from app.database import pool
+
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK_SIZE = 1000
+LEASE_NAME = "invoice_due_scheduler"
+
+def _parse_date(value) -> date:
+    return date.fromisoformat(str(value)[:10])
+
+class InvoiceDueScheduler:
+    # Heap (tanggal, jenis, invoice) untuk invoice pending:
+    #   due_soon -> pengingat N hari sebelum jatuh tempo
+    #   overdue  -> status pending -> overdue sehari setelah due_date
+    # Entri lama tidak dihapus dari heap; dicek ulang ke _entries saat diambil.
+    # Hanya worker pemegang lease (job_leases) yang memuat heap dan menjalankan event.
+    def __init__(self, reminder_days: int, batch_size: int, reload_interval: float, lease_seconds: int):
+        self.reminder_days = reminder_days
+        self.batch_size = batch_size
+        # Muat ulang berkala: tulis dari worker lain tidak terlihat oleh heap proses ini
+        self.reload_interval = reload_interval
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leader = False
+        self._heap = []
+        self._entries = {}
+        self._loaded_at = None
+        self.flipped = 0
+        self.reminders = 0
+
+    def schedule(self, invoice: dict):
+        # Worker lain tidak menyimpan heap; invoice-nya terbaca leader saat muat ulang
+        if not self.leader:
+            return
+        invoice_id = str(invoice["id"])
+        if invoice.get("status") != "pending" or not invoice.get("due_date"):
+            self.cancel(invoice_id)
+            return
+        due_date = _parse_date(invoice["due_date"])
+        entry = (invoice["workspace_id"], due_date)
+        if self._entries.get(invoice_id) == entry:
+            return
+        self._entries[invoice_id] = entry
+        heapq.heappush(self._heap, (due_date - timedelta(days=self.reminder_days), "due_soon", invoice_id, entry))
+        heapq.heappush(self._heap, (due_date + timedelta(days=1), "overdue", invoice_id, entry))
+
+    def cancel(self, invoice_id):
+        self._entries.pop(str(invoice_id), None)
+
+    def pop_due(self, today: date) -> list:
+        events = []
+        while self._heap and self._heap[0][0] <= today and len(events) < self.batch_size:
+            event = heapq.heappop(self._heap)
+            _, kind, invoice_id, entry = event
+            if self._entries.get(invoice_id) != entry:
+                continue
+            if kind == "overdue":
+                self._entries.pop(invoice_id, None)
+            events.append(event)
+        return events
+
+    def _requeue(self, events: list):
+        for event in events:
+            _, kind, invoice_id, entry = event
+            if kind == "overdue":
+                self._entries.setdefault(invoice_id, entry)
+            heapq.heappush(self._heap, event)
+
+    async def load(self):
+        # Bangun ulang heap dari semua invoice pending
+        rows = []
+        async with pool.connection() as supabase:
+            cursor = None
+            while True:
+                query = supabase.table("invoices").select("id, workspace_id, due_date, status").eq("status", "pending")
+                response = await keyset(query, "id", cursor, LOAD_CHUNK_SIZE).execute()
+                result = page(response.data, "id", LOAD_CHUNK_SIZE)
+                rows.extend(result["data"])
+                cursor = result["next_cursor"]
+                if not cursor:
+                    break
+        self._heap, self._entries = [], {}
+        for row in rows:
+            self.schedule(row)
+        self._loaded_at = time.monotonic()
+        logger.info("Invoice scheduler loaded %s pending invoices", len(self._entries))
+
+    async def _flip_overdue(self, supabase: AsyncClient, workspace_id, invoice_ids: list) -> list:
+        # Filter status=pending: invoice yang keburu dibayar tidak ikut berubah.
+        # workspace_metrics ikut ter-update oleh trigger invoices di database
+        response = await supabase.table("invoices").update({"status": "overdue"}).eq(
+            "workspace_id", workspace_id
+        ).eq("status", "pending").in_("id", invoice_ids).execute()
+        if response.data:
+            response_cache.bump(workspace_id, "invoices")
+        return response.data
+
+    async def _process(self, events: list):
+        overdue, reminders = {}, []
+        today = date.today()
+        for _, kind, invoice_id, (workspace_id, due_date) in events:
+            if kind == "overdue":
+                overdue.setdefault(workspace_id, []).append(invoice_id)
+            elif due_date >= today:
+                # Pengingat due_soon hanya untuk yang belum lewat jatuh tempo
+                reminders.append({"workspace_id": workspace_id, "invoice_id": invoice_id, "kind": kind, "due_date": due_date.isoformat()})
+
+        async with pool.connection() as supabase:
+            for workspace_id, invoice_ids in overdue.items():
+                flipped = await self._flip_overdue(supabase, workspace_id, invoice_ids)
+                self.flipped += len(flipped)
+                reminders += [
+                    {"workspace_id": workspace_id, "invoice_id": row["id"], "kind": "overdue", "due_date": row["due_date"]}
+                    for row in flipped
+                ]
+            if reminders:
+                # Event pengingat ditulis per batch ke outbox; duplikat diabaikan dan
+                # tidak dikembalikan, jadi yang dihitung hanya event yang baru
+                response = await supabase.table("invoice_reminders").upsert(
+                    reminders,
+                    on_conflict="invoice_id,kind",
+                    ignore_duplicates=True,
+                    returning=ReturnMethod.representation
+                ).execute()
+                self.reminders += len(response.data)
+
+    async def _acquire_lease(self) -> bool:
+        async with pool.connection() as supabase:
+            response = await supabase.rpc("acquire_job_lease", {
+                "p_name": LEASE_NAME,
+                "p_holder": self.holder,
+                "p_ttl_seconds": self.lease_seconds
+            }).execute()
+        return bool(response.data)
+
+    async def tick(self):
+        leader = await self._acquire_lease()
+        if not leader:
+            # Bukan leader: lepas heap; jika nanti jadi leader, dimuat ulang dari awal
+            self.leader, self._heap, self._entries, self._loaded_at = False, [], {}, None
+            return
+        self.leader = True
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_interval:
+            await self.load()
+        while True:
+            events = self.pop_due(date.today())
+            if not events:
+                return
+            try:
+                await self._process(events)
+            except Exception:
+                # Kembalikan ke heap, dicoba lagi di tick berikutnya
+                self._requeue(events)
+                raise
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.leader,
+            "scheduled": len(self._entries),
+            "heap_size": len(self._heap),
+            "next_due": self._heap[0][0].isoformat() if self._heap else None,
+            "flipped": self.flipped,
+            "reminders": self.reminders
+        }
+
+invoice_scheduler = InvoiceDueScheduler(
+    settings.INVOICE_REMINDER_DAYS,
+    settings.INVOICE_SCHEDULER_BATCH_SIZE,
+    settings.INVOICE_SCHEDULER_RELOAD_SECONDS,
+    settings.INVOICE_SCHEDULER_LEASE_SECONDS
+)
@@ -0,0 +1,64 @@
+import base64
+import json
+from fastapi import HTTPException, Query
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+def limit_param(default: int = DEFAULT_LIMIT):
+    return Query(default, ge=1, le=MAX_LIMIT)
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(400, "Invalid cursor")
+    return values
+
+def _quote(value) -> str:
+    # Nilai di filter or=() PostgREST dikutip supaya koma/titik/kurung aman
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def keyset(query, sort_key: str = "id", cursor: str = None, limit: int = DEFAULT_LIMIT, desc: bool = False):
+    # Urutan stabil: sort_key lalu id, lanjut dari posisi cursor (bukan OFFSET).
+    # Baris dengan sort_key NULL selalu di akhir (nullslast), diurutkan per id
+    op = "lt" if desc else "gt"
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        if sort_key == "id":
+            query = getattr(query, op)("id", last_id)
+        elif sort_value is None:
+            # Sudah masuk bagian NULL: tinggal lanjut per id
+            query = getattr(query.is_(sort_key, "null"), op)("id", last_id)
+        else:
+            query = query.or_(
+                f"{sort_key}.{op}.{_quote(sort_value)},"
+                f"and({sort_key}.eq.{_quote(sort_value)},id.{op}.{_quote(last_id)}),"
+                f"{sort_key}.is.null"
+            )
+    if sort_key == "id":
+        query = query.order("id", desc=desc)
+    else:
+        query = query.order(sort_key, desc=desc, nullsfirst=False).order("id", desc=desc)
+    # Ambil satu baris ekstra untuk tahu masih ada halaman berikutnya
+    return query.limit(limit + 1)
+
+def page(rows: list, sort_key: str = "id", limit: int = DEFAULT_LIMIT) -> dict:
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor([last.get(sort_key), last["id"]])
+    return {"data": rows, "next_cursor": next_cursor}
+
+async def paginate(query, sort_key: str = "id", cursor: str = None, limit: int = DEFAULT_LIMIT, desc: bool = False) -> dict:
+    response = await keyset(query, sort_key, cursor, limit, desc).execute()
+    return page(response.data, sort_key, limit)
@@ -0,0 +1,116 @@
+import numpy as np
+from supabase import AsyncClient
+from app.core import salary
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pagination import keyset, page
+
+HISTORY_CHUNK_SIZE = 1000
+HISTORY_COLUMNS = "id, employee_id, pay_date, gross_salary, deductions, hours_rate_a, hours_rate_b, hours_rate_c"
+
+def _columns(rows: list) -> dict:
+    # Baris payroll -> array per kolom; employee_id disimpan sebagai kode 0..n-1
+    employee_ids, codes = np.unique(np.array([str(row["employee_id"]) for row in rows], dtype=object), return_inverse=True)
+    columns = {
+        "employee_ids": employee_ids,
+        "employee_codes": codes,
+        "pay_date": np.array([(row["pay_date"] or "NaT")[:10] for row in rows], dtype="datetime64[D]")
+    }
+    for column in ("gross_salary", "deductions", "hours_rate_a", "hours_rate_b", "hours_rate_c"):
+        columns[column] = np.array([row.get(column) or 0 for row in rows], dtype=np.float64)
+    return columns
+
+class PayrollHistory:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = {}
+
+    async def load(self, supabase: AsyncClient, workspace_id: int) -> dict:
+        key = str(workspace_id)
+        columns = self._cache.get(key)
+        if columns is not None:
+            return columns
+
+        generation = self._generations.get(key, 0)
+        rows, cursor = [], None
+        while True:
+            query = supabase.table("payroll").select(HISTORY_COLUMNS).eq("workspace_id", workspace_id)
+            response = await keyset(query, "id", cursor, HISTORY_CHUNK_SIZE).execute()
+            result = page(response.data, "id", HISTORY_CHUNK_SIZE)
+            rows.extend(result["data"])
+            cursor = result["next_cursor"]
+            if not cursor:
+                break
+
+        columns = _columns(rows)
+        # Jangan simpan hasil yang sudah basi karena ada tulis payroll selama loading
+        if self._generations.get(key, 0) == generation:
+            self._cache.set(key, columns)
+        return columns
+
+    def invalidate(self, workspace_id: int):
+        key = str(workspace_id)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._cache.discard(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+def simulate(columns: dict, rates: tuple, deduction_rate: float, start_date: str = None, end_date: str = None) -> dict:
+    mask = np.ones(len(columns["employee_codes"]), dtype=bool)
+    if start_date:
+        mask &= columns["pay_date"] >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= columns["pay_date"] <= np.datetime64(end_date, "D")
+
+    codes = columns["employee_codes"][mask]
+    current_gross = columns["gross_salary"][mask]
+    current_net = current_gross - columns["deductions"][mask]
+    amounts = salary.compute(
+        columns["hours_rate_a"][mask], columns["hours_rate_b"][mask], columns["hours_rate_c"][mask],
+        rates, deduction_rate
+    )
+    # Baris lama tanpa jam kerja: skalakan gaji kotor dengan perubahan tarif A
+    no_hours = (columns["hours_rate_a"][mask] + columns["hours_rate_b"][mask] + columns["hours_rate_c"][mask]) == 0
+    gross = np.where(no_hours, current_gross * (rates[0] / salary.RATE_A), amounts["gross_salary"])
+    net = gross * (1 - deduction_rate)
+
+    size = len(columns["employee_ids"])
+    per_employee_current = np.bincount(codes, weights=current_net, minlength=size)
+    per_employee_simulated = np.bincount(codes, weights=net, minlength=size)
+    present = np.bincount(codes, minlength=size) > 0
+    delta = per_employee_simulated - per_employee_current
+    order = np.argsort(-np.abs(delta))
+    order = order[present[order]]
+
+    return {
+        "rows": int(mask.sum()),
+        "rows_without_hours": int(no_hours.sum()),
+        "current": {
+            "gross_salary": float(current_gross.sum()),
+            "deductions": float((current_gross - current_net).sum()),
+            "net_salary": float(current_net.sum())
+        },
+        "simulated": {
+            "gross_salary": float(gross.sum()),
+            "deductions": float((gross - net).sum()),
+            "net_salary": float(net.sum())
+        },
+        "net_delta": float(net.sum() - current_net.sum()),
+        "employees": [
+            {
+                "employee_id": employee_id,
+                "current_net": current,
+                "simulated_net": simulated,
+                "delta": change
+            }
+            for employee_id, current, simulated, change in zip(
+                columns["employee_ids"][order].tolist(),
+                per_employee_current[order].tolist(),
+                per_employee_simulated[order].tolist(),
+                delta[order].tolist()
+            )
+        ]
+    }
+
+payroll_history = PayrollHistory(settings.PAYROLL_HISTORY_CACHE_SIZE, settings.PAYROLL_HISTORY_CACHE_TTL)
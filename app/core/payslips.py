@@ -0,0 +1,133 @@
+import asyncio
+import html
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+
+_executor = None
+
+def worker_count() -> int:
+    return settings.PAYSLIP_WORKERS or os.cpu_count() or 1
+
+def executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=worker_count())
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _money(value) -> str:
+    return f"Rp {float(value or 0):,.2f}"
+
+def render_payslip(slip: dict) -> str:
+    employee = slip.get("employees") or {}
+    rows = [
+        ("Employee", employee.get("name") or slip["employee_id"]),
+        ("Employee ID", slip["employee_id"]),
+        ("Pay date", slip["pay_date"]),
+        ("Gross salary", _money(slip["gross_salary"])),
+        ("Deductions", _money(slip["deductions"])),
+        ("Net salary", _money(slip["net_salary"]))
+    ]
+    body = "".join(
+        f"<tr><th>{html.escape(label)}</th><td>{html.escape(str(value))}</td></tr>"
+        for label, value in rows
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>Payslip {html.escape(str(slip['pay_date']))}</title>"
+        "<style>body{font-family:sans-serif}th{text-align:left;padding-right:2em}</style>"
+        f"</head><body><h1>Payslip</h1><table>{body}</table></body></html>"
+    )
+
+def render_batch(slips: list) -> list:
+    # Jalan di proses worker: render + kompresi, hasilnya entri ZIP siap tulis
+    entries = []
+    for slip in slips:
+        data = render_payslip(slip).encode()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+        name = f"{slip['pay_date']}/{slip['employee_id']}-{slip['id']}.html"
+        entries.append((name, zlib.crc32(data), len(data), compressed))
+    return entries
+
+def _dos_datetime(timestamp: float):
+    t = time.localtime(timestamp)
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    )
+
+class ZipWriter:
+    # Penulis ZIP streaming untuk entri yang sudah dikompresi (deflate mentah) di worker
+    def __init__(self):
+        self._offset = 0
+        self._central = []
+        self._time, self._date = _dos_datetime(time.time())
+
+    def entry(self, name: str, crc: int, size: int, compressed: bytes) -> bytes:
+        if self._offset > 0xFFFFFFFF:
+            raise ValueError("ZIP archive too large")
+        encoded = name.encode()
+        fields = (20, 0x0800, 8, self._time, self._date, crc, len(compressed), size, len(encoded))
+        header = struct.pack("<IHHHHHIIIHH", 0x04034B50, *fields, 0) + encoded
+        self._central.append(
+            struct.pack("<IH", 0x02014B50, 20) + struct.pack("<HHHHHIIIHHHHHII", *fields, 0, 0, 0, 0, 0, self._offset) + encoded
+        )
+        self._offset += len(header) + len(compressed)
+        return header + compressed
+
+    def finish(self) -> bytes:
+        central = b"".join(self._central)
+        count, start = len(self._central), self._offset
+        trailer = b""
+        if count > 0xFFFF or start > 0xFFFFFFFF:
+            # ZIP64: jumlah entri / offset central directory melebihi format biasa
+            end64 = start + len(central)
+            trailer = (
+                struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, len(central), start)
+                + struct.pack("<IIQI", 0x07064B50, 0, end64, 1)
+            )
+            count, start = 0xFFFF, 0xFFFFFFFF
+        end = struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, len(central), min(start, 0xFFFFFFFF), 0)
+        return central + trailer + end
+
+async def zip_payslips(rows, batch_size: int = None):
+    # Render per batch di process pool; entri ditulis ke ZIP begitu batch selesai
+    batch_size = batch_size or settings.PAYSLIP_BATCH_SIZE
+    loop = asyncio.get_running_loop()
+    pool = executor()
+    max_in_flight = worker_count() * 2
+    writer = ZipWriter()
+    pending = set()
+
+    async def drain(return_when):
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        return b"".join(writer.entry(*entry) for future in done for entry in future.result())
+
+    try:
+        batch = []
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                pending.add(loop.run_in_executor(pool, render_batch, batch))
+                batch = []
+                if len(pending) >= max_in_flight:
+                    yield await drain(asyncio.FIRST_COMPLETED)
+        if batch:
+            pending.add(loop.run_in_executor(pool, render_batch, batch))
+        if pending:
+            yield await drain(asyncio.ALL_COMPLETED)
+        yield writer.finish()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,37 @@
+from supabase import AsyncClient
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+_MISSING = object()
+
+class MembershipResolver:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get_role(self, supabase: AsyncClient, user_id: str, workspace_id=None):
+        # workspace_id None = role user di workspace miliknya sendiri
+        key = (str(user_id), None if workspace_id is None else str(workspace_id))
+        role = self._cache.get(key, _MISSING)
+        if role is not _MISSING:
+            return role
+
+        query = supabase.table("users").select("role").eq("id", user_id)
+        if workspace_id is not None:
+            query = query.eq("workspace_id", workspace_id)
+        response = await query.limit(1).execute()
+
+        # Bukan anggota juga di-cache (None) supaya request yang ditolak tidak query ulang
+        role = response.data[0]["role"] if response.data else None
+        self._cache.set(key, role)
+        return role
+
+    async def is_member(self, supabase: AsyncClient, user_id: str, workspace_id) -> bool:
+        return await self.get_role(supabase, user_id, workspace_id) is not None
+
+    def invalidate_user(self, user_id: str):
+        self._cache.discard_where(lambda key: key[0] == str(user_id))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+memberships = MembershipResolver(settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_CACHE_TTL)
@@ -0,0 +1,66 @@
+from supabase import AsyncClient
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+SUM_FIELDS = ("budget", "actual_cost", "invoiced", "paid", "outstanding", "contracted")
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if numerator is not None and denominator else None
+
+def _with_metrics(row: dict) -> dict:
+    budget, actual_cost, invoiced = row.get("budget"), row.get("actual_cost"), row["invoiced"]
+    margin = invoiced - actual_cost if actual_cost is not None else None
+    return {
+        **row,
+        # burn_rate: porsi budget yang sudah terpakai (1.0 = budget habis)
+        "burn_rate": _ratio(actual_cost, budget),
+        "budget_remaining": budget - actual_cost if budget is not None and actual_cost is not None else None,
+        "margin": margin,
+        "margin_rate": _ratio(margin, invoiced),
+        "collection_rate": _ratio(row["paid"], invoiced)
+    }
+
+def _portfolio(rows: list) -> dict:
+    projects = [_with_metrics(row) for row in rows]
+    totals = {field: sum(float(project.get(field) or 0) for project in projects) for field in SUM_FIELDS}
+    totals["project_count"] = len(projects)
+    totals["margin"] = totals["invoiced"] - totals["actual_cost"]
+    totals["burn_rate"] = _ratio(totals["actual_cost"], totals["budget"])
+    totals["margin_rate"] = _ratio(totals["margin"], totals["invoiced"])
+    return {"totals": totals, "projects": projects}
+
+class ProjectFinancials:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = {}
+
+    async def portfolio(self, supabase: AsyncClient, workspace_id: int) -> dict:
+        key = str(workspace_id)
+        portfolio = self._cache.get(key)
+        if portfolio is not None:
+            return portfolio
+
+        generation = self._generations.get(key, 0)
+        response = await supabase.rpc("project_financials", {"p_workspace_id": workspace_id}).execute()
+        portfolio = _portfolio(response.data or [])
+        # Jangan simpan hasil yang sudah basi karena ada tulis selama query berjalan
+        if self._generations.get(key, 0) == generation:
+            self._cache.set(key, portfolio)
+        return portfolio
+
+    async def project(self, supabase: AsyncClient, workspace_id: int, project_id) -> dict:
+        portfolio = await self.portfolio(supabase, workspace_id)
+        for project in portfolio["projects"]:
+            if str(project["project_id"]) == str(project_id):
+                return project
+        return None
+
+    def invalidate(self, workspace_id):
+        key = str(workspace_id)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._cache.discard(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+project_financials = ProjectFinancials(settings.PROJECT_FINANCIALS_CACHE_SIZE, settings.PROJECT_FINANCIALS_CACHE_TTL)
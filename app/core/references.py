@@ -0,0 +1,64 @@
+import asyncio
+from fastapi import HTTPException
+from supabase import AsyncClient
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+LOOKUP_CHUNK_SIZE = 500
+
+# Tabel yang boleh direferensikan -> label untuk pesan error
+REFERENCE_LABELS = {
+    "crm_contacts": "Contact",
+    "customers": "Customer",
+    "projects": "Project",
+    "contracts": "Contract",
+    "employees": "Employee"
+}
+
+class ReferenceValidator:
+    def __init__(self, maxsize: int, ttl: float):
+        # Hanya id yang ada yang di-cache; id baru langsung valid tanpa invalidasi
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def existing(self, supabase: AsyncClient, workspace_id, refs: dict) -> dict:
+        # refs: {tabel: [id, ...]} -> {tabel: set id yang ada di workspace}
+        workspace = str(workspace_id)
+        found = {table: set() for table in refs}
+        lookups = []
+        for table, ids in refs.items():
+            missing = []
+            for id in {str(id) for id in ids if id is not None}:
+                if self._cache.get((workspace, table, id)):
+                    found[table].add(id)
+                else:
+                    missing.append(id)
+            for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+                lookups.append((table, missing[start:start + LOOKUP_CHUNK_SIZE]))
+
+        # Semua lookup (semua tabel, semua potongan) jalan bersamaan
+        responses = await asyncio.gather(*(
+            supabase.table(table).select("id").eq("workspace_id", workspace_id).in_("id", chunk).execute()
+            for table, chunk in lookups
+        ))
+        for (table, _), response in zip(lookups, responses):
+            for row in response.data:
+                id = str(row["id"])
+                found[table].add(id)
+                self._cache.set((workspace, table, id), True)
+        return found
+
+    async def require(self, supabase: AsyncClient, workspace_id, **refs):
+        # require(supabase, 1, crm_contacts=contact_id, projects=project_id); None dilewati
+        refs = {table: id for table, id in refs.items() if id is not None}
+        found = await self.existing(supabase, workspace_id, {table: [id] for table, id in refs.items()})
+        for table, id in refs.items():
+            if str(id) not in found[table]:
+                raise HTTPException(400, f"{REFERENCE_LABELS.get(table, table)} not found")
+
+    def forget(self, workspace_id, table: str, id):
+        self._cache.discard((str(workspace_id), table, str(id)))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+references = ReferenceValidator(settings.REFERENCE_CACHE_SIZE, settings.REFERENCE_CACHE_TTL)
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from supabase import AsyncClient
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.permissions import memberships
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match boleh berisi beberapa tag, "*" atau tag lemah (W/"...")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+class ResponseCache:
+    # Body JSON + ETag per (workspace, resource, route, query, role).
+    # Handler tulis menaikkan versi (workspace, resource); entri dengan versi lama dianggap basi.
+    def __init__(self, maxsize: int, ttl: float):
+        # TTL membatasi basi akibat tulis dari worker lain (versi hanya per proses)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self.not_modified = 0
+
+    def version(self, workspace_id, resource: str) -> int:
+        return self._versions.get((str(workspace_id), resource), 0)
+
+    def bump(self, workspace_id, *resources: str):
+        workspace = str(workspace_id)
+        for resource in resources:
+            key = (workspace, resource)
+            self._versions[key] = self._versions.get(key, 0) + 1
+        self._cache.discard_where(lambda key: key[0] == workspace and key[1] in resources)
+
+    def _response(self, request: Request, body: bytes, etag: str) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def respond(self, request: Request, supabase: AsyncClient, current_user: dict, workspace_id, resource: str, build) -> Response:
+        # Dipanggil setelah has_permission; role dari cache membership (tanpa query)
+        role = await memberships.get_role(supabase, current_user["id"], workspace_id)
+        key = (
+            str(workspace_id), resource, request.url.path,
+            tuple(sorted(request.query_params.multi_items())), role
+        )
+        version = self.version(workspace_id, resource)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == version:
+            # Hit: 304 atau body tersimpan, tanpa query DB dan tanpa serialisasi
+            return self._response(request, entry[2], entry[1])
+
+        data = await build()
+        body = json.dumps(
+            jsonable_encoder(data), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        # Jangan simpan hasil yang sudah basi karena ada tulis selama query berjalan
+        if self.version(workspace_id, resource) == version:
+            self._cache.set(key, (version, etag, body))
+        return self._response(request, body, etag)
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "not_modified": self.not_modified}
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
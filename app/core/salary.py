@@ -0,0 +1,22 @@
+import numpy as np
+
+# Tarif per jam: B = 2x A, C = 3x A; potongan 3% dari gaji kotor
+RATE_A = 20000
+RATE_B = RATE_A * 2
+RATE_C = RATE_A * 3
+DEDUCTION_RATE = 0.03
+
+def compute(hours_rate_a, hours_rate_b, hours_rate_c, rates=(RATE_A, RATE_B, RATE_C), deduction_rate: float = DEDUCTION_RATE) -> dict:
+    # Terima skalar atau array (satu elemen per karyawan), hitung sekaligus
+    hours = np.stack([
+        np.asarray(hours_rate_a, dtype=np.float64),
+        np.asarray(hours_rate_b, dtype=np.float64),
+        np.asarray(hours_rate_c, dtype=np.float64)
+    ], axis=-1)
+    gross = hours @ np.asarray(rates, dtype=np.float64)
+    deductions = gross * deduction_rate
+    return {
+        "gross_salary": gross,
+        "deductions": deductions,
+        "net_salary": gross - deductions
+    }
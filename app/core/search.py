@@ -0,0 +1,19 @@
+from supabase import AsyncClient
+
+# full = kata utuh + potongan kata + mirip (trigram); prefix = typeahead, prefix tiap kata
+SEARCH_MODE_PATTERN = "^(full|prefix)$"
+SEARCH_MAX_LIMIT = 100
+# Entitas di search_index (nama tabel sumber) untuk GET /workspaces/{id}/search
+SEARCH_ENTITIES = ("customers", "crm_contacts", "projects", "contracts", "employees", "invoices")
+
+async def ranked_search(supabase: AsyncClient, function: str, workspace_id: int, q: str, mode: str = "full", limit: int = 20, **filters) -> dict:
+    # Hasil sudah diurutkan berdasarkan rank (RPC search_customers / search_contacts / search_workspace), tanpa cursor
+    params = {
+        "p_workspace_id": workspace_id,
+        "p_query": q,
+        "p_prefix": mode == "prefix",
+        "p_limit": min(limit, SEARCH_MAX_LIMIT)
+    }
+    params.update({f"p_{name}": value for name, value in filters.items()})
+    response = await supabase.rpc(function, params).execute()
+    return {"data": response.data or [], "next_cursor": None}
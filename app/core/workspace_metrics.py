@@ -0,0 +1,18 @@
+from supabase import AsyncClient
+from app.database import pool
+
+async def reconcile(supabase: AsyncClient, workspace_id: int = None) -> list:
+    response = await supabase.rpc("reconcile_workspace_metrics", {"p_workspace_id": workspace_id}).execute()
+    return response.data
+
+async def get_metrics(supabase: AsyncClient, workspace_id: int) -> dict:
+    response = await supabase.table("workspace_metrics").select("*").eq("workspace_id", workspace_id).execute()
+    if response.data:
+        return response.data[0]
+    # Workspace belum punya baris agregat -> hitung sekali dari awal
+    rows = await reconcile(supabase, workspace_id)
+    return rows[0] if rows else {}
+
+async def reconcile_all():
+    async with pool.connection() as supabase:
+        await reconcile(supabase)
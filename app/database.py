@@ -1,8 +1,112 @@
-from supabase import Client, create_client
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from fastapi import HTTPException
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 from app.core.config import settings
 
-def get_supabase() -> Client:
-    return create_client(
-        settings.SUPABASE_URL,
-        settings.SUPABASE_SERVICE_ROLE_KEY
-    )
\ No newline at end of file
+def _client_options() -> AsyncClientOptions:
+    # Tanpa sesi tersimpan / refresh token: header Authorization tetap service role
+    return AsyncClientOptions(persist_session=False, auto_refresh_token=False)
+
+async def _create_client() -> AsyncClient:
+    return await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY, options=_client_options())
+
+async def close_client(client: AsyncClient):
+    # Tutup semua sesi HTTP (postgrest, auth, storage, functions) yang sudah dibuat
+    sessions = [client.auth._http_client]
+    if client._postgrest is not None:
+        sessions.append(client._postgrest.session)
+    if client._storage is not None:
+        sessions += [client._storage.session, client._storage._client]
+    if client._functions is not None:
+        sessions.append(client._functions._client)
+    closed = set()
+    for session in sessions:
+        if session is None or id(session) in closed:
+            continue
+        closed.add(id(session))
+        try:
+            await session.aclose()
+        except Exception:
+            pass
+
+class SupabasePool:
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self._idle = None
+        self._clients = []
+        self._in_use = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def open(self):
+        if self._clients:
+            return
+        self._idle = asyncio.LifoQueue(maxsize=self.size)
+        for _ in range(self.size):
+            # Client dipakai ulang sehingga sesi HTTP (keep-alive) tetap hidup.
+            # Banyak client kecil lebih cepat daripada satu client dengan ratusan
+            # koneksi: pool httpcore men-scan semua koneksi di setiap request.
+            client = await _create_client()
+            # Client postgrest dibuat lazy (SSL context ~30 ms per client): buat sekarang, bukan di request pertama
+            client.postgrest
+            self._clients.append(client)
+            self._idle.put_nowait(client)
+
+    async def close(self):
+        for client in self._clients:
+            await close_client(client)
+        self._clients = []
+        self._idle = None
+
+    @asynccontextmanager
+    async def connection(self):
+        if not self._clients:
+            await self.open()
+        start = time.perf_counter()
+        try:
+            client = await asyncio.wait_for(self._idle.get(), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise HTTPException(503, "Database pool exhausted")
+        waited = time.perf_counter() - start
+        self._in_use += 1
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        try:
+            yield client
+        finally:
+            self._in_use -= 1
+            self._idle.put_nowait(client)
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._clients),
+            "in_use": self._in_use,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "acquired": self._acquired,
+            "timeouts": self._timeouts,
+            "wait_avg_ms": (self._wait_total / self._acquired * 1000) if self._acquired else 0.0,
+            "wait_max_ms": self._wait_max * 1000,
+        }
+
+pool = SupabasePool(settings.SUPABASE_POOL_SIZE, settings.SUPABASE_POOL_TIMEOUT)
+
+async def get_supabase() -> AsyncIterator[AsyncClient]:
+    async with pool.connection() as client:
+        yield client
+
+async def get_auth_client() -> AsyncIterator[AsyncClient]:
+    # sign_up / sign_in_with_password mengganti header Authorization client dengan JWT user
+    # (event SIGNED_IN), jadi auth selalu pakai client sendiri per request, tidak pernah dari pool
+    client = await _create_client()
+    try:
+        yield client
+    finally:
+        await close_client(client)
@@ -1,28 +1,101 @@
-from fastapi import FastAPI, Request
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from Backend.app.core import auth
-from app.routers import workspace, project
-
-limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["5/minute"]
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
+from limits import parse, storage, strategies
+from app.database import pool
+from app.core.config import settings
+from app.core.background import PeriodicTask
+from app.core import workspace_metrics, invoice_aging
+from app.core.contract_expiry import contract_expiry
+from app.core.invoice_scheduler import invoice_scheduler
+from app.core.auth import require_admin, token_cache
+from app.core.permissions import memberships
+from app.core.payroll_history import payroll_history
+from app.core.payslips import shutdown_executor
+from app.core.references import references
+from app.core.project_financials import project_financials
+from app.core.response_cache import response_cache
+from app.routers import (
+    analytics, auth, contract, crm, customer, employee, invoices, payroll, project, search, users, workspace
 )
 
 app = FastAPI(title="ERP Backend")
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-@app.middleware("http")
-async def inject_rate_limit(request: Request, call_next):
-    # Terapkan rate limit hanya ke endpoint /auth/*
-    if "/auth" in request.url.path:
-        # Contoh: Batasi 2 request per 10 detik untuk enpoint auth
-        limiter.limit("2/10second")(call_next)
-    return await limiter.limit_request(request, call_next)
+# Satu-satunya rate limiter aplikasi: endpoint /auth/* per IP (AuthRateLimitMiddleware)
+AUTH_RATE_LIMIT = parse("2/10second")
+auth_rate_limiter = strategies.FixedWindowRateLimiter(storage.MemoryStorage())
+
+background_tasks = [
+    PeriodicTask("reconcile_workspace_metrics", settings.METRICS_RECONCILE_SECONDS, workspace_metrics.reconcile_all),
+    PeriodicTask("contract_expiry_queue", settings.CONTRACT_EXPIRY_QUEUE_SECONDS, contract_expiry.drain),
+    PeriodicTask("contract_expiry_sweep", settings.CONTRACT_EXPIRY_SWEEP_SECONDS, contract_expiry.enqueue_all, run_at_start=True),
+    PeriodicTask("invoice_due_scheduler", settings.INVOICE_SCHEDULER_SECONDS, invoice_scheduler.tick, run_at_start=True),
+    PeriodicTask("invoice_aging_roll_forward", settings.INVOICE_AGING_ROLL_SECONDS, invoice_aging.roll_forward_all),
+]
+
+@app.on_event("startup")
+async def startup():
+    await pool.open()
+    for task in background_tasks:
+        task.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        await task.stop()
+    shutdown_executor()
+    await pool.close()
+
+@app.get("/metrics/pool", dependencies=[Depends(require_admin)])
+def get_pool_metrics():
+    return pool.metrics()
+
+@app.get("/metrics/jobs", dependencies=[Depends(require_admin)])
+def get_job_metrics():
+    return {
+        "tasks": {task.name: task.stats() for task in background_tasks},
+        "contract_expiry": contract_expiry.stats(),
+        "invoice_scheduler": invoice_scheduler.stats()
+    }
+
+@app.get("/metrics/cache", dependencies=[Depends(require_admin)])
+def get_cache_metrics():
+    return {
+        "tokens": token_cache.stats(),
+        "memberships": memberships.stats(),
+        "payroll_history": payroll_history.stats(),
+        "references": references.stats(),
+        "project_financials": project_financials.stats(),
+        "responses": response_cache.stats()
+    }
+
+class AuthRateLimitMiddleware:
+    # Middleware ASGI murni: @app.middleware("http") (BaseHTTPMiddleware) menambah
+    # task group anyio di setiap request, termasuk yang bukan /auth
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Terapkan rate limit hanya ke endpoint /auth/*
+        if scope["type"] == "http" and scope["path"].startswith("/auth/"):
+            # Contoh: Batasi 2 request per 10 detik untuk enpoint auth
+            client = Request(scope).client
+            if not auth_rate_limiter.hit(AUTH_RATE_LIMIT, client.host if client else "127.0.0.1"):
+                response = JSONResponse({"error": f"Rate limit exceeded: {AUTH_RATE_LIMIT}"}, status_code=429)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(AuthRateLimitMiddleware)
 
 app.include_router(auth.router)
 app.include_router(workspace.router)
-app.include_router(project.router)
\ No newline at end of file
+app.include_router(project.router)
+app.include_router(search.router)
+app.include_router(customer.router)
+app.include_router(crm.router)
+app.include_router(contract.router)
+app.include_router(invoices.router)
+app.include_router(employee.router)
+app.include_router(payroll.router)
+app.include_router(analytics.router)
+app.include_router(users.router)
\ No newline at end of file
@@ -1,12 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core import workspace_metrics
+from app.core.concurrency import gather_with_deadline, server_timing
+from app.core.config import settings
+from app.core.references import references
+from app.core.project_financials import project_financials
+from app.core.response_cache import response_cache
+from postgrest.types import ReturnMethod
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List
+import asyncio
 
 router = APIRouter(prefix="/workspaces")
 
+ANALYTICS_UPSERT_CHUNK = 1000
+ANALYTICS_UPSERT_CONCURRENCY = 4
+
+def _range_error(value, low, high, message):
+    if value is not None and (value < low or value > high):
+        return message
+    return None
+
+async def _upsert_batch(supabase: AsyncClient, table: str, on_conflict: str, rows: list) -> list:
+    # rows: [(index, payload)]; upsert per potongan, dikembalikan daftar error per baris
+    # Satu statement harus punya kolom yang sama, jadi baris dikelompokkan per set kolom
+    groups = {}
+    for index, payload in rows:
+        groups.setdefault(tuple(sorted(payload)), []).append((index, payload))
+    chunks = [
+        group[start:start + ANALYTICS_UPSERT_CHUNK]
+        for group in groups.values()
+        for start in range(0, len(group), ANALYTICS_UPSERT_CHUNK)
+    ]
+    semaphore = asyncio.Semaphore(ANALYTICS_UPSERT_CONCURRENCY)
+    errors = []
+
+    async def upsert(chunk):
+        async with semaphore:
+            try:
+                await supabase.table(table).upsert(
+                    [payload for _, payload in chunk],
+                    on_conflict=on_conflict,
+                    returning=ReturnMethod.minimal
+                ).execute()
+            except Exception as e:
+                message = f"Upsert failed: {getattr(e, 'message', None) or e}"
+                errors.extend({"index": index, "error": message} for index, _ in chunk)
+
+    await asyncio.gather(*(upsert(chunk) for chunk in chunks))
+    return errors
+
 # --- Project Analytics ---
 class ProjectAnalyticsInput(BaseModel):
     progress: float = None
@@ -15,50 +61,96 @@ class ProjectAnalyticsInput(BaseModel):
     kpi: dict = None
     
 @router.post("/{workspace_id}/analytics/projects/{project_id}")
-def create_or_update_project_analytics(
+async def create_or_update_project_analytics(
     workspace_id: int,
     project_id: str,
     data: ProjectAnalyticsInput,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Validasi project ada di workspace
-    project = supabase.table("projects").select("id").eq("id", project_id).eq("workspace_id", workspace_id).execute()
-    if not project.data:
+    found = await references.existing(supabase, workspace_id, {"projects": [project_id]})
+    if str(project_id) not in found["projects"]:
         raise HTTPException(404, "Project not found")
     
-    # Cek apakah analytics sudah ada
-    existing = supabase.table("project_analytics").select("id").eq("project_id", project_id).eq("workspace_id", workspace_id).execute()
+    error = _range_error(data.progress, 0, 100, "Progress must be between 0-100%")
+    if error:
+        raise HTTPException(400, error)
     
     payload = data.dict(exclude_unset=True)
     payload["project_id"] = project_id
     payload["workspace_id"] = workspace_id
     payload["updated_at"] = datetime.now().isoformat()
     
-    if existing.data:
-        # Update
-        response = supabase.table("project_analytics").update(payload).eq("project_id", project_id).eq("workspace_id", workspace_id).execute()
-    else:
-        # Create
-        payload["created_at"] = datetime.now().isoformat()
-        response = supabase.table("project_analytics").insert(payload).execute()
-        
+    # Insert atau update dalam satu statement (created_at dari default database)
+    response = await supabase.table("project_analytics").upsert(
+        payload, on_conflict="workspace_id,project_id"
+    ).execute()
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "project_analytics")
     return response.data[0]
 
+class ProjectAnalyticsBatchItem(ProjectAnalyticsInput):
+    project_id: str
+
+class ProjectAnalyticsBatch(BaseModel):
+    items: List[ProjectAnalyticsBatchItem]
+
+@router.post("/{workspace_id}/analytics/projects")
+async def upsert_project_analytics_batch(
+    workspace_id: int,
+    data: ProjectAnalyticsBatch,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    found = (await references.existing(
+        supabase, workspace_id, {"projects": [item.project_id for item in data.items]}
+    ))["projects"]
+    updated_at = datetime.now().isoformat()
+    errors, rows, seen = [], [], set()
+    for index, item in enumerate(data.items):
+        error = (
+            ("Project not found" if item.project_id not in found else None)
+            or ("Duplicate project in batch" if item.project_id in seen else None)
+            or _range_error(item.progress, 0, 100, "Progress must be between 0-100%")
+        )
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        seen.add(item.project_id)
+        payload = item.dict(exclude_unset=True)
+        payload["workspace_id"] = workspace_id
+        payload["updated_at"] = updated_at
+        rows.append((index, payload))
+    
+    errors += await _upsert_batch(supabase, "project_analytics", "workspace_id,project_id", rows)
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "project_analytics")
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "total": len(data.items),
+        "upserted": len(data.items) - len(errors),
+        "failed": len(errors),
+        "errors": errors
+    }
+
 @router.get("/{workspace_id}/analytics/projects/{project_id}")
-def get_project_analytics(
+async def get_project_analytics(
     workspace_id: int,
     project_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("project_analytics").select("*").eq("project_id", project_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("project_analytics").select("*").eq("project_id", project_id).eq("workspace_id", workspace_id).execute()
     return response.data[0] if response.data else {}
 
 # --- Employee Analytics ---
@@ -68,143 +160,202 @@ class EmployeeAnalyticsInput(BaseModel):
     evaluations: dict = None # Contoh: {"attendance": 4.5, "initiative": "excellent"}
     
 @router.post("/{workspace_id}/analytics/employees/{employee_id}")
-def create_or_update_employee_analytics(
+async def create_or_update_employee_analytics(
     workspace_id: int,
     employee_id: str,
     data: EmployeeAnalyticsInput,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Validasi employee ada di workspace
-    employee = supabase.table("employees").select("id").eq("employee_id", employee_id).eq("workspace_id", workspace_id).execute()
-    if not employee.data:
+    found = await references.existing(supabase, workspace_id, {"employees": [employee_id]})
+    if str(employee_id) not in found["employees"]:
         raise HTTPException(404, "Employee not found")
     
-    if data.progress is not None and (data.progress < 0 or data.progress > 100):
-        raise HTTPException(400, "Progress must be between 0-100%")
-    
-    if data.performance_store is not None and (data.performance_store < 0 or data.performance_store > 100):
-        raise HTTPException(400, "Performance score must be between 0-100")
-    
-    existing = supabase.table("employee_analytics").select("id").eq("employee_id", employee_id).eq("workspace_id", workspace_id).execute()
+    error = _range_error(data.performance_store, 0, 100, "Performance score must be between 0-100")
+    if error:
+        raise HTTPException(400, error)
     
     payload = data.dict(exclude_unset=True)
     payload["employee_id"] = employee_id
     payload["workspace_id"] = workspace_id
     payload["updated_at"] = datetime.now().isoformat()
     
-    if existing.data:
-        # Update
-        response = supabase.table("employee_analytics").update(payload).eq("employee_id", employee_id).eq("workspace_id", workspace_id).execute()
-    else:
-        # Create
-        payload["created_at"] = datetime.now().isoformat()
-        response = supabase.table("employee_analytics").insert(payload).execute()
-        
+    # Insert atau update dalam satu statement (created_at dari default database)
+    response = await supabase.table("employee_analytics").upsert(
+        payload, on_conflict="workspace_id,employee_id"
+    ).execute()
     return response.data[0]
 
+class EmployeeAnalyticsBatchItem(EmployeeAnalyticsInput):
+    employee_id: str
+
+class EmployeeAnalyticsBatch(BaseModel):
+    items: List[EmployeeAnalyticsBatchItem]
+
+@router.post("/{workspace_id}/analytics/employees")
+async def upsert_employee_analytics_batch(
+    workspace_id: int,
+    data: EmployeeAnalyticsBatch,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    found = (await references.existing(
+        supabase, workspace_id, {"employees": [item.employee_id for item in data.items]}
+    ))["employees"]
+    updated_at = datetime.now().isoformat()
+    errors, rows, seen = [], [], set()
+    for index, item in enumerate(data.items):
+        error = (
+            ("Employee not found" if item.employee_id not in found else None)
+            or ("Duplicate employee in batch" if item.employee_id in seen else None)
+            or _range_error(item.performance_store, 0, 100, "Performance score must be between 0-100")
+        )
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        seen.add(item.employee_id)
+        payload = item.dict(exclude_unset=True)
+        payload["workspace_id"] = workspace_id
+        payload["updated_at"] = updated_at
+        rows.append((index, payload))
+    
+    errors += await _upsert_batch(supabase, "employee_analytics", "workspace_id,employee_id", rows)
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "total": len(data.items),
+        "upserted": len(data.items) - len(errors),
+        "failed": len(errors),
+        "errors": errors
+    }
+
 @router.get("/{workspace_id}/analytics/employees/{employee_id}")
-def get_employee_analytics(
+async def get_employee_analytics(
     workspace_id: int,
     employee_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("employee_analytics").select("*").eq("employee_id", employee_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("employee_analytics").select("*").eq("employee_id", employee_id).eq("workspace_id", workspace_id).execute()
     return response.data[0] if response.data else {}
 
 # --- Dashboard Analytics ---
+def _count(results: dict, name: str):
+    return results[name].count if name in results else None
+
+def _rows(results: dict, name: str):
+    return results[name].data if name in results else None
+
+def _first(results: dict, name: str, column: str):
+    rows = _rows(results, name)
+    return rows[0][column] if rows else None
+
 @router.get("/{workspace_id}/analytics")
-def get_workspace_analytics(
+async def get_workspace_analytics(
     workspace_id: int,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    # Ambil analytics proyek
-    project_analytics = supabase.table("project_analytics").select(
-        "project_id, progress, budget, actual_cost, kpi"
-    ).eq("workspace_id", workspace_id).execute()
-    
-    # Ambil analytics karyawan
-    employee_analytics = supabase.table("employee_analytics").select(
-        "employee_id, performance_score, task_completion, evaluations"
-    ).eq("workspace_id", workspace_id).execute()
-    
-    # CRM Metrics
-    crm_metrics = {
-        "total_contacts": supabase.table("crm_contacts").count().eq("workspace_id", workspace_id).execute().data[0]["count"],
-        "total_oppotunities": supabase.table("crm_opportunities").count().eq("workspace_id", workspace_id).execute().data[0]["count"],
-        "recent_interactions": supabase.table("crm_interactions").select("*").eq("workspace_id", workspace_id).order("interaction_date", desc=True).limit(10).execute().data
-    }
+    results, timings, errors = await gather_with_deadline({
+        # Ambil analytics proyek
+        "projects": supabase.table("project_analytics").select(
+            "project_id, progress, budget, actual_cost, kpi"
+        ).eq("workspace_id", workspace_id).execute(),
+        # Ambil analytics karyawan
+        "employees": supabase.table("employee_analytics").select(
+            "employee_id, performance_score, task_completion, evaluations"
+        ).eq("workspace_id", workspace_id).execute(),
+        # CRM Metrics
+        "contacts": supabase.table("crm_contacts").select("id", count="exact", head=True).eq("workspace_id", workspace_id).execute(),
+        "opportunities": supabase.table("crm_opportunities").select("id", count="exact", head=True).eq("workspace_id", workspace_id).execute(),
+        "recent_interactions": supabase.table("crm_interactions").select("*").eq("workspace_id", workspace_id).order("interaction_date", desc=True).limit(10).execute()
+    }, settings.ANALYTICS_DEADLINE_SECONDS)
+    response.headers["Server-Timing"] = server_timing(timings)
     
     return {
-        "projects": project_analytics.data,
-        "employees": employee_analytics.data,
-        "crm": crm_metrics
+        "projects": _rows(results, "projects"),
+        "employees": _rows(results, "employees"),
+        "crm": {
+            "total_contacts": _count(results, "contacts"),
+            "total_oppotunities": _count(results, "opportunities"),
+            "recent_interactions": _rows(results, "recent_interactions")
+        },
+        "partial": bool(errors),
+        "errors": errors
     }
     
 @router.get("/{workspace_id}/analytics/projects")
-def get_all_project_analytics(
+async def get_all_project_analytics(
     workspace_id: int,
+    request: Request,
     min_progress: float = None, # Filter proyek dengan progress >= X%
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     query = supabase.table("project_analytics").select("*").eq("workspace_id", workspace_id)
     
     if min_progress is not None:
         query = query.gte("progress", min_progress)
-        
-    response = query.execute()
-    return response.data
+    
+    async def build():
+        return (await query.execute()).data
+    return await response_cache.respond(request, supabase, current_user, workspace_id, "project_analytics", build)
 
 @router.get("/{workspace_id}/analytics/dashboard")
-def get_dashboard_analytics(
+async def get_dashboard_analytics(
     workspace_id: int,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    # Rata - rata progress proyek
-    avg_progress = supabase.table("project_analytics").select("avg(progress)").eq("workspace_id", workspace_id).execute()
-    
-    # Jumlah karyawan dengan skor diatas 80
-    top_employees = supabase.table("employee_analytics").select("employee_id").eq("workspace_id", workspace_id).execute()
-    
-    # Metrik CRM
-    crm_metrics = {
-        "total_contacts": supabase.table("crm_contacts").count().eq("workspace_id", workspace_id).execute(),
-        "total_opportunities": supabase.table("crm_opportunities").count().eq("workspace_id", workspace_id).execute(),
+    # Semua sub-query jalan bersamaan, latency ~ query paling lambat
+    results, timings, errors = await gather_with_deadline({
+        # Rata - rata progress proyek
+        "avg_progress": supabase.rpc("project_progress_avg", {"p_workspace_id": workspace_id}).execute(),
+        # Jumlah karyawan dengan skor diatas 80
+        "top_employees": supabase.table("employee_analytics").select("employee_id", count="exact", head=True).eq("workspace_id", workspace_id).execute(),
         "recent_interactions": supabase.table("crm_interactions").select(
             "id, contact_id, type, notes, interaction_date"
-        ).eq("workspace_id", workspace_id).order("interaction_date", desc=True).limit(10).execute()
-    }
-    
-    # Metrik Invoice
-    invoice_metrics = {
-        "total_invoices": supabase.table("invoices").count().eq("workspace_id", workspace_id).execute().data[0]["count"],
-        "overdue_invoices": supabase.table("invoices").count().eq("workspace_id", workspace_id).eq("status", "pending").lt("due_date", datetime.now().date().isoformat()).execute().data[0]["count"],
-        "total_amount_owed": supabase.table("invoices").select("sum(amount)").eq("workspace_id", workspace_id).eq("status", "pending").execute().data[0]["sum"],
-        "paid_amount": supabase.table("invoices").select("sum(amount)").eq("workspace_id", workspace_id).eq("status", "paid").execute()
-    }
+        ).eq("workspace_id", workspace_id).order("interaction_date", desc=True).limit(10).execute(),
+        # Metrik CRM & invoice dari tabel agregat (satu baris)
+        "metrics": workspace_metrics.get_metrics(supabase, workspace_id)
+    }, settings.ANALYTICS_DEADLINE_SECONDS)
+    response.headers["Server-Timing"] = server_timing(timings)
+    metrics = results.get("metrics") or {}
     
     return {
-        "average_project_progress": avg_progress.data[0]["avg"] if avg_progress.data else 0,
-        "top_employees_count": len(top_employees.data),
-        "crm": crm_metrics,
-        "invoices": invoice_metrics
+        "average_project_progress": _first(results, "avg_progress", "avg") or 0,
+        "top_employees_count": _count(results, "top_employees"),
+        "crm": {
+            "total_contacts": metrics.get("total_contacts"),
+            "total_opportunities": metrics.get("total_opportunities"),
+            "recent_interactions": _rows(results, "recent_interactions")
+        },
+        "invoices": {
+            "total_invoices": metrics.get("total_invoices"),
+            "overdue_invoices": metrics.get("overdue_invoices"),
+            "total_amount_owed": metrics.get("amount_owed"),
+            "paid_amount": metrics.get("amount_paid")
+        },
+        "partial": bool(errors),
+        "errors": errors
     }
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
-from supabase import Client
-from app.core.auth import oauth2_scheme
-from app.database import get_supabase
+from supabase import AsyncClient, AuthApiError
+from app.core.auth import get_current_user
+from app.core.permissions import memberships
+from app.database import get_auth_client, get_supabase
 import re
 
 router = APIRouter(prefix="/auth")
@@ -20,42 +21,43 @@ def validate_password(password: str):
         raise HTTPException(status_code=400, detail="password must contain number")
 
 @router.post("/register")
-async def register(email: str, password: str):
+async def register(email: str, password: str, supabase: AsyncClient = Depends(get_auth_client)):
     validate_password(password)
     
-    supabase: Client = get_supabase()
     try:
-        response = supabase.auth.sign_up(
-            email=email,
-            password=password
-        )
-        if response.status_code == 200:
-            return {"message": "Registration successful", "user_id": response.data.user.id}
-        else:
-            raise HTTPException(status_code=400, detail="Registration failed")
+        response = await supabase.auth.sign_up({
+            "email": email,
+            "password": password
+        })
+    except AuthApiError as e:
+        raise HTTPException(status_code=400, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not response.user:
+        raise HTTPException(status_code=400, detail="Registration failed")
+    return {"message": "Registration successful", "user_id": response.user.id}
 
 @router.post("/login")
-async def login(username: str, password: str):
-    supabase: Client = get_supabase()
-    response = supabase.auth.sign_in_with_password(
-        email=username,
-        password=password
-    )
-    if response.status_code == 200:
-        return {"access_token": response.data.session.access_token}
-    raise HTTPException(status_code=401, detail="Invalid credentials")
+async def login(username: str, password: str, supabase: AsyncClient = Depends(get_auth_client)):
+    try:
+        response = await supabase.auth.sign_in_with_password({
+            "email": username,
+            "password": password
+        })
+    except AuthApiError:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not response.session:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return {"access_token": response.session.access_token}
 
 @router.post("/profile")
-def create_profile(
+async def create_profile(
     full_name: str,
     workspace_id: int,
-    token: str = Depends(oauth2_scheme)
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    supabase: Client = get_supabase()
-    user = supabase.auth.get_user(token)
-    user_id = user.data.user.id
+    user_id = current_user["id"]
     
     data = {
         "id": user_id,
@@ -64,5 +66,6 @@ def create_profile(
         "role": "member"
     }
     
-    response = supabase.table("users").insert(data).execute()
+    response = await supabase.table("users").insert(data).execute()
+    memberships.invalidate_user(user_id)
     return {"message": "Profile created", "user": response.data[0]}
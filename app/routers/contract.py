@@ -1,21 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core.export import EXPORT_FORMAT_PATTERN, export_response, iter_rows
+from app.core.references import references
+from app.core.contract_expiry import contract_expiry
+from app.core.project_financials import project_financials
+from app.core.response_cache import response_cache
 
 router = APIRouter(prefix="/workspaces")
 
 @router.get("/{workspace_id}/contracts")
-def get_contracts(
+async def get_contracts(
     workspace_id: int,
+    request: Request,
     status: str = None,
     contract_type: str = None,
     customer_id: str = None,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     query = supabase.table("contracts").select(
@@ -29,11 +37,41 @@ def get_contracts(
     if customer_id:
         query = query.eq("customer_id", customer_id)
 
-    response = query.execute()
-    return response.data
+    return await response_cache.respond(
+        request, supabase, current_user, workspace_id, "contracts",
+        lambda: paginate(query, "start_date", cursor, limit)
+    )
+
+CONTRACT_EXPORT_COLUMNS = ["id", "title", "customer_id", "project_id", "start_date", "end_date", "status", "contract_type"]
+
+@router.get("/{workspace_id}/contracts/export")
+async def export_contracts(
+    workspace_id: int,
+    format: str = Query("ndjson", regex=EXPORT_FORMAT_PATTERN),
+    status: str = None,
+    contract_type: str = None,
+    customer_id: str = None,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    def build_query(client):
+        query = client.table("contracts").select(", ".join(CONTRACT_EXPORT_COLUMNS)).eq("workspace_id", workspace_id)
+        if status:
+            query = query.eq("status", status)
+        if contract_type:
+            query = query.eq("contract_type", contract_type)
+        if customer_id:
+            query = query.eq("customer_id", customer_id)
+        return query
+    
+    rows = iter_rows(build_query, "start_date")
+    return export_response(rows, format, CONTRACT_EXPORT_COLUMNS, f"contracts-{workspace_id}")
 
 @router.post("/{workspace_id}/contracts")
-def create_contracts(
+async def create_contracts(
     workspace_id: int,
     title: str,
     contact_id: str,
@@ -46,25 +84,16 @@ def create_contracts(
     description: str = None,
     terms: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    # validasi contact ada di workspace
-    contact = supabase.table("crm_contacts").select("id").eq("id", contact_id).eq("workspace_id", workspace_id).execute()
-    if not contact.data:
-        raise HTTPException(400, "Contact not found")
-    
-    # Validasi customer dan project
-    customer = supabase.table("customers").select("id").eq("id", customer_id).eq("workspace_id", workspace_id).execute()
-    if not customer.data:
-        raise HTTPException(400, "Customer not found")
-    
-    if project_id:
-        project = supabase.table("projects").select("id").eq("id", project_id).eq("workspace_id", workspace_id).execute()
-        if not project.data:
-            raise HTTPException(400, "Project not found")
+    # Validasi contact, customer dan project ada di workspace (sekaligus)
+    await references.require(
+        supabase, workspace_id,
+        crm_contacts=contact_id, customers=customer_id, projects=project_id
+    )
         
     data = {
         "title": title,
@@ -79,11 +108,13 @@ def create_contracts(
         "workspace_id": workspace_id
     }
     
-    response = supabase.table("contracts").insert(data).execute()
+    response = await supabase.table("contracts").insert(data).execute()
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "contracts")
     return response.data[0]
 
-@router.put("/{workspace.id}/contracts/{contract_id}")
-def update_contract(
+@router.put("/{workspace_id}/contracts/{contract_id}")
+async def update_contract(
     workspace_id: int,
     contract_id: str,
     title: str = None,
@@ -91,9 +122,9 @@ def update_contract(
     description: str = None,
     terms: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     updates = {}
@@ -106,37 +137,42 @@ def update_contract(
     if terms:
         updates["terms"] = terms
         
-    response = supabase.table("contracts").update(updates).eq("id", contract_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("contracts").update(updates).eq("id", contract_id).eq("workspace_id", workspace_id).execute()
     if not response.data:
         raise HTTPException(404, "Contract not found")
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "contracts")
     return response.data[0]
 
 @router.delete("/{workspace_id}/contracts/{contract_id}")
-def delete_contract(
+async def delete_contract(
     workspace_id: int,
     contract_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("contracts").delete().eq("id", contract_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("contracts").delete().eq("id", contract_id).eq("workspace_id", workspace_id).execute()
+    references.forget(workspace_id, "contracts", contract_id)
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "contracts")
     if not response.data:
         raise HTTPException(404, "Contract not found")
     return {"message": "Contract deleted"}
 
 @router.get("/{workspace_id}/contracts/{contract_id}/details")
-def get_contract_details(
+async def get_contract_details(
     workspace_id: int,
     contract_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("contracts").select(
+    response = await supabase.table("contracts").select(
         "id, title, description, customer_id, project_id, start_date, end_date, status, contract_type, terms"
     ).eq("id", contract_id).eq("workspace_id", workspace_id).execute()
     
@@ -145,46 +181,49 @@ def get_contract_details(
     
     return response.data[0]
 
-@router.post("/{workspace_id}/contracts/update-status")
-def trigger_auto_update(
+@router.post("/{workspace_id}/contracts/update-status", status_code=202)
+async def trigger_auto_update(
     workspace_id: int,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    current_date = datetime.now().date().isoformat()
-    response = supabase.table("contracts").update({"status": "expired"}).lt("end_date", current_date).execute()
-    return {"message": f"{len(response.data)} contracts updated to expired!"}
+    # Hanya antrekan workspace ini; job background yang meng-expire kontrak per batch
+    queued = contract_expiry.enqueue(workspace_id)
+    return {
+        "message": "Contract expiry queued" if queued else "Contract expiry already queued",
+        "last_run": contract_expiry.last_runs.get(workspace_id)
+    }
 
 @router.get("/{workspace_id}/contracts/{contract_id}/crm")
-def get_contract_crm_data(
+async def get_contract_crm_data(
     workspace_id: int,
     contract_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("contracts").select(
+    response = await supabase.table("contracts").select(
         "contact_id, crm_contacts!inner(*)" # Join dengan contact
     ).eq("id", contract_id).execute()
     
     return response.data[0]
 
 @router.get("/{workspace_id}/contracts/{contract_id}/invoices")
-def get_contract_invoices(
+async def get_contract_invoices(
     workspace_id: int,
     contract_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("invoices").select(
+    response = await supabase.table("invoices").select(
         "id, amount, due_date, status"
     ).eq("contract_id", contract_id).eq("workspace_id", workspace_id).execute()
     
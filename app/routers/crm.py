@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core import dedup, imports
+from app.core.references import references
+from app.core.search import SEARCH_MODE_PATTERN, ranked_search
 from datetime import datetime
+import asyncio
 
 router = APIRouter(prefix="/workspaces")
 
+# Agregasi CRM dihitung di database (RPC crm_summary) dalam satu round trip
+async def get_crm_summary(supabase: AsyncClient, workspace_id: int) -> dict:
+    response = await supabase.rpc("crm_summary", {"p_workspace_id": workspace_id}).execute()
+    return response.data
+
 # --- CRM Contacts ---
 @router.post("/{workspace_id}/crm/contacts")
-def create_contact(
+async def create_contact(
     workspace_id: int,
     name: str,
     email: str,
@@ -16,12 +26,19 @@ def create_contact(
     company: str = None,
     lead_status: str = "prospect",
     source: str = "website",
+    allow_duplicate: bool = False,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
+    # Kontak dengan email/telepon yang sama (setelah normalisasi) sudah ada
+    if not allow_duplicate:
+        matches = await dedup.find_matches(supabase, workspace_id, ("crm_contacts",), email=email, phone=phone)
+        if matches:
+            raise HTTPException(409, {"message": "Possible duplicate contact", "matches": matches})
+    
     data = {
         "name": name,
         "email": email,
@@ -32,20 +49,32 @@ def create_contact(
         "workspace_id": workspace_id
     }
     
-    response = supabase.table("crm_contacts").insert(data).execute()
+    response = await supabase.table("crm_contacts").insert(data).execute()
     return response.data[0]
 
+@router.post("/{workspace_id}/crm/contacts/import")
+async def import_contacts(
+    workspace_id: int,
+    file: UploadFile = File(...), # CSV dengan header: name,email,phone,company,lead_status,source
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    return await imports.import_csv(supabase, workspace_id, "crm_contacts", file)
+
 @router.get("/{workspace_id}/crm/contacts/{contact_id}")
-def get_contact(
+async def get_contact(
     workspace_id: int,
     contact_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("crm_contacts").select(
+    response = await supabase.table("crm_contacts").select(
         "id, name, email, phone, company, lead_status, source"
     ).eq("id", contact_id).eq("workspace_id", workspace_id).execute()
     
@@ -53,7 +82,7 @@ def get_contact(
 
 # --- CRM Opportunities ---
 @router.post("/{workspace_id}/crm/opportunities")
-def create_opportunity(
+async def create_opportunity(
     workspace_id: int,
     contact_id: str,
     title: str,
@@ -61,15 +90,13 @@ def create_opportunity(
     project_id: str = None, # Terkait proyek
     status: str = "open",
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    # Validasi contact id
-    contact = supabase.table("crm_contacts").select("id").eq("id", contact_id).eq("workspace_id", workspace_id).execute()
-    if not contact.data:
-        raise HTTPException(400, "Contact not found")
+    # Validasi contact & project dalam satu round trip
+    await references.require(supabase, workspace_id, crm_contacts=contact_id, projects=project_id)
     
     data = {
         "contact_id": contact_id,
@@ -80,26 +107,24 @@ def create_opportunity(
         "workspace_id": workspace_id
     }
     
-    response = supabase.table("crm_opportunities").insert(data).execute()
+    response = await supabase.table("crm_opportunities").insert(data).execute()
     return response.data[0]
 
 # --- CRM Interactions ---
 @router.post("/{workspace_id}/crm/interactions")
-def create_interactions(
+async def create_interactions(
     workspace_id: int,
     contact_id: str,
     type: str,
     notes: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Validasi contact_id
-    contact = supabase.table("crm_contacts").select("id").eq("id", contact_id).eq("workspace_id", workspace_id).execute()
-    if not contact.data:
-        raise HTTPException(400, "Contact not found")
+    await references.require(supabase, workspace_id, crm_contacts=contact_id)
     
     data = {
         "contact_id": contact_id,
@@ -108,27 +133,27 @@ def create_interactions(
         "workspace_id": workspace_id
     }
     
-    response = supabase.table("crm_interactions").insert(data).execute()
+    response = await supabase.table("crm_interactions").insert(data).execute()
     return response.data[0]
 
 # --- Integrasi dengan modul lainnya ---
 @router.get("/{workspace_id}/projects/{project_id}/crm")
-def get_project_crm_data(
+async def get_project_crm_data(
     workspace_id: int,
     project_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Dapatkan kontrak terkait proyek
-    contracts = supabase.table("contracts").select(
+    contracts = await supabase.table("contracts").select(
         "id, title, customer_id, project_id, status"
     ).eq("project_id", project_id).eq("workspace_id", workspace_id).execute()
     
     # Dapatkan interaksi terkait proyek
-    interactions = supabase.table("crm_interactions").select(
+    interactions = await supabase.table("crm_interactions").select(
         "id, contact_id, type, notes, interactions_date"
     ).join("crm_contacts", "crm_interactions.contact_id", "=", "crm_contacts.id").execute()
     
@@ -138,16 +163,25 @@ def get_project_crm_data(
     }
     
 @router.get("/{workspace_id}/crm/contacts")
-def search_contacts(
+async def search_contacts(
     workspace_id: int,
+    q: str = None, # Cari di name, email, company, phone
+    mode: str = Query("full", regex=SEARCH_MODE_PATTERN), # prefix = typeahead
     company: str = None,
     lead_status: str = None,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
+    if q and q.strip():
+        return await ranked_search(
+            supabase, "search_contacts", workspace_id, q, mode, limit, lead_status=lead_status, company=company
+        )
+    
     query = supabase.table("crm_contacts").select(
         "id, name, email, company, lead_status"
     ).eq("workspace_id", workspace_id)
@@ -157,54 +191,80 @@ def search_contacts(
     if lead_status:
         query = query.eq("lead_status", lead_status)
         
-    return query.execute().data
+    return await paginate(query, cursor=cursor, limit=limit)
+
+@router.get("/{workspace_id}/crm/duplicates")
+async def get_duplicates(
+    workspace_id: int,
+    threshold: float = Query(None, ge=0, le=1),
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    # Kandidat duplikat lintas customers & crm_contacts (blocking, bukan O(n^2))
+    return await dedup.scan_workspace(supabase, workspace_id, threshold=threshold)
 
 @router.get("/{workspace_id}/crm/dashboard")
-def get_crm_dashboard(
+async def get_crm_dashboard(
     workspace_id: int,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
+    summary = await get_crm_summary(supabase, workspace_id)
+    opportunities = summary["opportunities"]
     return {
-        "total_contacts": 100,
-        "total_oppotunities": 30,
-        "closed_opportunities": 15,
-        "recent_interactions": [
-            # Data interaksi terkini
-        ]
+        "total_contacts": sum(summary["lead_status"].values()),
+        "total_oppotunities": opportunities["open"] + opportunities["closed"],
+        "open_opportunities": opportunities["open"],
+        "closed_opportunities": opportunities["closed"],
+        "open_value": opportunities["open_value"],
+        "closed_value": opportunities["closed_value"],
+        "recent_interactions": summary["recent_interactions"]
     }
 
 @router.get("/{workspace_id}/crm/reports/conversion")
-def get_lead_conversion_report(
+async def get_conversion_report(
     workspace_id: int,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Hitung konversi lead dari prospect ke closed
-    conversion = supabase.table("crm_contacts").select(
-        "lead_status",
-        "count(*)",
-        group="lead_status"
-    ).eq("workspace_id", workspace_id).execute()
+    summary = await get_crm_summary(supabase, workspace_id)
+    lead_status = summary["lead_status"]
+    total_contacts = sum(lead_status.values())
+    opportunities = summary["opportunities"]
+    total_opportunities = opportunities["open"] + opportunities["closed"]
     
     return {
-        "conversion_rates": conversion.data
+        "total_contacts": total_contacts,
+        "conversion_rates": {
+            status: {
+                "count": count,
+                "rate": count / total_contacts if total_contacts else 0.0
+            }
+            for status, count in lead_status.items()
+        },
+        "opportunity_close_rate": opportunities["closed"] / total_opportunities if total_opportunities else 0.0
     }
     
 @router.get("/{workspace_id}/crm/opportunities")
-def get_opportunities(
+async def get_opportunities(
     workspace_id: int,
     status: str = None,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     query = supabase.table("crm_opportunities").select(
@@ -214,57 +274,60 @@ def get_opportunities(
     if status:
         query = query.eq("status", status)
     
-    return query.execute().data
+    return await paginate(query, cursor=cursor, limit=limit)
 
 @router.get("/{workspace_id}/crm/reports/lead-conversion")
-def get_lead_conversion_report(
+async def get_lead_conversion_report(
     workspace_id: int,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    conversion = supabase.table("crm_contacts").select(
-        "lead_status",
-        "count(*)",
-        group="lead_status"
-    ).eq("workspace_id", workspace_id).execute()
-    
+    lead_status = (await get_crm_summary(supabase, workspace_id))["lead_status"]
     return {
-        "prospect": 20,
-        "qualified": 15,
-        "closed": 5
+        "prospect": lead_status.get("prospect", 0),
+        "qualified": lead_status.get("qualified", 0),
+        "closed": lead_status.get("closed", 0),
+        **lead_status
     }
 
 @router.get("/{workspace_id}/crm/reports/opportunity-project")
-def get_opportunity_project_report(
+async def get_opportunity_project_report(
     workspace_id: int,
+    include_rows: bool = False,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    opportunities = supabase.table("crm_opportunities").select(
+    # Total & group per project dihitung di database (RPC opportunity_report)
+    report_query = supabase.rpc("opportunity_report", {"p_workspace_id": workspace_id})
+    if not include_rows:
+        return (await report_query.execute()).data
+    
+    opportunities_query = supabase.table("crm_opportunities").select(
         "title, estimated_value, project_id"
-    ).eq("workspace_id", workspace_id).execute()
+    ).eq("workspace_id", workspace_id)
     
+    report, opportunities = await asyncio.gather(report_query.execute(), opportunities_query.execute())
     return {
-        "opportunities": opportunities.data,
-        "total_value": sum(opportunity.estimated_value for opportunity in opportunities.data)
+        **report.data,
+        "opportunities": opportunities.data
     }
     
 @router.put("/{workspace_id}/crm/opportunities/{opportunity_id}")
-def update_opportunity(
+async def update_opportunity(
     workspace_id: int,
     opportunity_id: str,
     status: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("crm_opportunities").update({"status": status}).eq("id", opportunity_id).execute()
+    response = await supabase.table("crm_opportunities").update({"status": status}).eq("id", opportunity_id).execute()
     return response.data[0]
\ No newline at end of file
@@ -1,61 +1,135 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from supabase import Client
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core import dedup, imports
+from app.core.references import references
+from app.core.search import SEARCH_MODE_PATTERN, ranked_search
+import asyncio
 
 router = APIRouter(prefix="/workspaces")
 
 @router.get("/{workspace_id}/customers")
-def get_customers(
+async def get_customers(
     workspace_id: int,
     search: str = None,
+    mode: str = Query("full", regex=SEARCH_MODE_PATTERN), # prefix = typeahead
     company: str = None,
-    page: int = Query(1, ge=1),
-    limit: int = Query(10, le=100),
+    cursor: str = None,
+    limit: int = limit_param(10),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    offset = (page - 1) * limit
+    if search and search.strip():
+        # Pencarian pakai index trigram/full-text, hasil diurutkan berdasarkan relevansi
+        return await ranked_search(
+            supabase, "search_customers", workspace_id, search, mode, limit, company=company
+        )
     
-    query = supabase.table("customers").select("*").eq("workspace_id", workspace_id).range(offset, offset + limit)
+    query = supabase.table("customers").select("*").eq("workspace_id", workspace_id)
     
-    if search:
-        query = query.or_(
-            supabase.table("customers").filter("name", "ilike", f"%{search}%"),
-            supabase.table("customers").filter("email", "ilike", f"%{search}%")
-        )
     if company:
         query = query.eq("company", company)
     
-    response = query.execute()
-    return response.data
+    return await paginate(query, cursor=cursor, limit=limit)
 
-@router.get("/{workspace_id}/customers/{customers_id}/projects")
-def get_customer_project(
+@router.get("/{workspace_id}/customers/{customer_id}/projects")
+async def get_customer_project(
     workspace_id: int,
     customer_id: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(10, le=100),
+    cursor: str = None,
+    limit: int = limit_param(10),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    offset = (page - 1) * limit
-    
-    response = supabase.table("projects").select("*") \
+    query = supabase.table("projects").select("*") \
         .eq("workspace_id", workspace_id) \
-        .eq("customer_id", customer_id) \
-        .range(offset, offset + limit) \
-        .execute()
-    return response.data
+        .eq("customer_id", customer_id)
+    return await paginate(query, cursor=cursor, limit=limit)
+
+CUSTOMER_SUMMARY_SECTIONS = ("projects", "contracts", "invoices")
+OPEN_INVOICE_STATUSES = ("pending", "overdue")
+
+def _invoice_totals(groups: list) -> dict:
+    # groups: hasil customer_invoice_totals per status [{status, sum, count}]
+    by_status = {}
+    for group in groups:
+        status = group.get("status") or "unknown"
+        totals = by_status.setdefault(status, {"count": 0, "amount": 0.0})
+        totals["count"] += group.get("count") or 0
+        totals["amount"] += float(group.get("sum") or 0)
+    return {
+        "total_invoices": sum(totals["count"] for totals in by_status.values()),
+        "total_amount": sum((totals["amount"] for totals in by_status.values()), 0.0),
+        "outstanding_amount": sum(by_status.get(status, {}).get("amount", 0.0) for status in OPEN_INVOICE_STATUSES),
+        "by_status": by_status
+    }
+
+@router.get("/{workspace_id}/customers/{customer_id}/summary")
+async def get_customer_summary(
+    workspace_id: int,
+    customer_id: str,
+    include: str = ",".join(CUSTOMER_SUMMARY_SECTIONS), # Contoh: include=projects,invoices
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    sections = {section.strip() for section in include.split(",") if section.strip()}
+    unknown = sections - set(CUSTOMER_SUMMARY_SECTIONS)
+    if unknown:
+        raise HTTPException(400, f"Unknown sections: {', '.join(sorted(unknown))}")
+    
+    # Customer + project + kontrak dalam satu request (embedded join), agregat invoice
+    # per kontrak lewat RPC yang jalan bersamaan
+    columns = ["*"]
+    if "projects" in sections:
+        columns.append("projects!customer_id(id, name, description)")
+    if "contracts" in sections or "invoices" in sections:
+        contract_columns = ["id"]
+        if "contracts" in sections:
+            contract_columns += ["title", "status", "contract_type", "start_date", "end_date", "project_id"]
+        columns.append(f"contracts!customer_id({', '.join(contract_columns)})")
+    
+    query = supabase.table("customers").select(", ".join(columns)).eq("id", customer_id).eq("workspace_id", workspace_id)
+    if "projects" in sections:
+        query = query.eq("projects.workspace_id", workspace_id)
+    if "contracts" in sections or "invoices" in sections:
+        query = query.eq("contracts.workspace_id", workspace_id)
+    if "invoices" in sections:
+        totals_query = supabase.rpc("customer_invoice_totals", {"p_workspace_id": workspace_id, "p_customer_id": customer_id})
+        response, totals = await asyncio.gather(query.execute(), totals_query.execute())
+    else:
+        response = await query.execute()
+    if not response.data:
+        raise HTTPException(404, "Customer not found")
+    
+    customer = response.data[0]
+    contracts = customer.pop("contracts", None) or []
+    summary = {"customer": customer}
+    if "projects" in sections:
+        summary["projects"] = customer.pop("projects", None) or []
+    if "invoices" in sections:
+        by_contract = {}
+        for group in totals.data:
+            by_contract.setdefault(group["contract_id"], []).append(group)
+        for contract in contracts:
+            contract["invoice_totals"] = _invoice_totals(by_contract.get(str(contract["id"]), []))
+        summary["invoices"] = _invoice_totals(totals.data)
+    if "contracts" in sections:
+        summary["contracts"] = contracts
+    return summary
 
 @router.post("/{workspace_id}/customers")
-def create_customers(
+async def create_customers(
     workspace_id: int,
     name: str,
     email: str,
@@ -63,9 +137,9 @@ def create_customers(
     address: str = None,
     company: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     data = {
@@ -79,15 +153,28 @@ def create_customers(
     if not name or not email:
         raise HTTPException(400, "Name or Email is required")
     
-    existing = supabase.table("customers").select("id").eq("email", email).eq("workspace_id", workspace_id).execute()
-    if existing.data:
+    # Email dibandingkan setelah normalisasi (huruf besar/kecil, spasi)
+    existing = await dedup.find_matches(supabase, workspace_id, ("customers",), email=email)
+    if existing:
         raise HTTPException(400, "Email already exists")
     else:
-        response = supabase.table("customers").insert(data).execute()
+        response = await supabase.table("customers").insert(data).execute()
     return response.data[0]
 
+@router.post("/{workspace_id}/customers/import")
+async def import_customers(
+    workspace_id: int,
+    file: UploadFile = File(...), # CSV dengan header: name,email,phone,address,company
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    return await imports.import_csv(supabase, workspace_id, "customers", file)
+
 @router.put("/{workspace_id}/customers/{customer_id}")
-def update_customers(
+async def update_customers(
     workspace_id: str,
     customer_id: str,
     name: str = None,
@@ -96,9 +183,9 @@ def update_customers(
     address: str = None,
     company: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     updates = {}
@@ -113,22 +200,23 @@ def update_customers(
     if company:
         updates["company"] = company
         
-    response = supabase.table("customers").update(updates).eq("id", customer_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("customers").update(updates).eq("id", customer_id).eq("workspace_id", workspace_id).execute()
     if not response.data:
         raise HTTPException(404, "Customer not found")
     return response.data[0]
 
-@router.delete("/{workspaces_id}/customers/{customer_id}")
-def delete_customer(
+@router.delete("/{workspace_id}/customers/{customer_id}")
+async def delete_customer(
     workspace_id: int,
     customer_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("customers").delete().eq("id", customer_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("customers").delete().eq("id", customer_id).eq("workspace_id", workspace_id).execute()
+    references.forget(workspace_id, "customers", customer_id)
     if not response.data:
         raise HTTPException(404, "Customer not found")
     return {"message": "Customer deleted"}
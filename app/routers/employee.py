@@ -1,33 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.config import settings
+from app.core import imports
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core.references import references
 
 router = APIRouter(prefix="/workspaces")
     
 @router.get("/{workspace_id}/employees")
-def get_employees(
+async def get_employees(
     workspace_id: int,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     # Hanya user dari workspace yang bisa melihat data
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
-    response = supabase.table("employees").select("*").eq("workspace_id", workspace_id).execute()
-    return response.data
+    query = supabase.table("employees").select("*").eq("workspace_id", workspace_id)
+    return await paginate(query, cursor=cursor, limit=limit)
 
 @router.post("/{workspace_id}/employees")
-def create_employees(
+async def create_employees(
     workspace_id: int,
     name: str,
     position: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
     data = {
@@ -35,19 +40,31 @@ def create_employees(
         "position": position,
         "workspace_id": workspace_id
     }
-    response = supabase.table("employees").insert(data).execute()
+    response = await supabase.table("employees").insert(data).execute()
     return response.data[0]
 
+@router.post("/{workspace_id}/employees/import")
+async def import_employees(
+    workspace_id: int,
+    file: UploadFile = File(...), # CSV dengan header: name,position
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    
+    return await imports.import_csv(supabase, workspace_id, "employees", file)
+
 @router.put("/{workspace_id}/employees/{employee_id}")
-def update_employee(
+async def update_employee(
     workspace_id: int,
     employee_id: str,
     name: str = None,
     position: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
     updates = {}
@@ -56,22 +73,23 @@ def update_employee(
     if position:
         updates["position"] = position
         
-    response = supabase.table("employees").update(updates).eq("id", employee_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("employees").update(updates).eq("id", employee_id).eq("workspace_id", workspace_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Employee not found")
     return response.data[0]
 
-@router.detele("/{workspace_id}/employees/{employee_id}")
-def delete_employee(
+@router.delete("/{workspace_id}/employees/{employee_id}")
+async def delete_employee(
     workspace_id: int,
     employee_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
-    response = supabase.table("employees").delete().eq("id", employee_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("employees").delete().eq("id", employee_id).eq("workspace_id", workspace_id).execute()
+    references.forget(workspace_id, "employees", employee_id)
     if not response.data:
         raise HTTPException(404, "Employee not found")
     return {"message": "Employee deleted"}
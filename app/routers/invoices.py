@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core.export import EXPORT_FORMAT_PATTERN, export_response, iter_rows
+from app.core import invoice_aging
+from app.core.references import references
+from app.core.invoice_scheduler import invoice_scheduler
+from app.core.project_financials import project_financials
+from app.core.response_cache import response_cache
 from datetime import datetime
+import asyncio
 
 router = APIRouter(prefix="/workspaces")
 
@@ -16,7 +24,7 @@ def validate_due_date(due_date):
 
 # --- Endpoint untuk Invoice ---
 @router.post("/{workspace_id}/invoices")
-def create_invoices(
+async def create_invoices(
     workspace_id: int,
     amount: float,
     due_date: str,
@@ -25,24 +33,16 @@ def create_invoices(
     project_id: str = None,
     contract_id: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Validasi tanggal
     validate_due_date(due_date)
     
     # validasi project_id / contract_id jika diberikan
-    if project_id:
-        project = supabase.table("projects").select("id").eq("id", project_id).eq("workspace_id", workspace_id).execute()
-        if not project.data:
-            raise HTTPException(400, "Project not found")
-        
-    if contract_id:
-        contract = supabase.table("contracts").select("id").eq("id", contract_id).eq("workspace_id", workspace_id).execute()
-        if not contract.data:
-            raise HTTPException(400, "Contract not found")
+    await references.require(supabase, workspace_id, projects=project_id, contracts=contract_id)
         
     data = {
         "project_id": project_id,
@@ -55,19 +55,25 @@ def create_invoices(
         "status": "pending" # Default status
     }
     
-    response = supabase.table("invoices").insert(data).execute()
+    response = await supabase.table("invoices").insert(data).execute()
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "invoices")
+    invoice_scheduler.schedule(response.data[0])
     return response.data[0]
 
 @router.get ("/{workspace_id}/invoices")
-def get_invoices(
+async def get_invoices(
     workspace_id: int,
+    request: Request,
     project_id: str = None,
     contract_id: str = None,
     status: str = None,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     query = supabase.table("invoices").select(
@@ -81,19 +87,55 @@ def get_invoices(
     if status:
         query = query.eq("status", status)
         
-    response = query.execute()
-    return response.data
+    return await response_cache.respond(
+        request, supabase, current_user, workspace_id, "invoices",
+        lambda: paginate(query, "due_date", cursor, limit)
+    )
+
+INVOICE_EXPORT_COLUMNS = ["id", "project_id", "contract_id", "amount", "due_date", "status", "payment_method", "notes"]
+
+@router.get("/{workspace_id}/invoices/export")
+async def export_invoices(
+    workspace_id: int,
+    format: str = Query("ndjson", regex=EXPORT_FORMAT_PATTERN),
+    start_date: str = None,
+    end_date: str = None,
+    status: str = None,
+    project_id: str = None,
+    contract_id: str = None,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    def build_query(client):
+        query = client.table("invoices").select(", ".join(INVOICE_EXPORT_COLUMNS)).eq("workspace_id", workspace_id)
+        if start_date:
+            query = query.gte("due_date", start_date)
+        if end_date:
+            query = query.lte("due_date", end_date)
+        if status:
+            query = query.eq("status", status)
+        if project_id:
+            query = query.eq("project_id", project_id)
+        if contract_id:
+            query = query.eq("contract_id", contract_id)
+        return query
+    
+    rows = iter_rows(build_query, "due_date")
+    return export_response(rows, format, INVOICE_EXPORT_COLUMNS, f"invoices-{workspace_id}")
 
 @router.put("/{workspace_id}/invoices/{invoice_id}")
-def update_invoice(
+async def update_invoice(
     workspace_id: int,
     invoice_id: str,
     status: str = None,
     notes: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     updates = {}
@@ -101,58 +143,92 @@ def update_invoice(
         updates["status"] = status
     if notes:
         updates["notes"] = notes
-        
-    response = supabase.table("invoices").update(updates).eq("id", invoice_id).eq("workspace_id", workspace_id).execute()
+    
+    response = await supabase.table("invoices").update(updates).eq("id", invoice_id).eq("workspace_id", workspace_id).execute()
     if not response.data:
         raise HTTPException(404, "Invoice not found")
     
+    if status:
+        project_financials.invalidate(workspace_id)
+        invoice_scheduler.schedule(response.data[0])
+    response_cache.bump(workspace_id, "invoices")
     return response.data[0]
 
 @router.delete("/{workspace_id}/invoices/{invoice_id}")
-def delete_invoice(
+async def delete_invoice(
     workspace_id: int,
     invoice_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("invoices").delete().eq("id", invoice_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("invoices").delete().eq("id", invoice_id).eq("workspace_id", workspace_id).execute()
     if not response.data:
         raise HTTPException(404, "Invoice not found")
     
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "invoices")
+    invoice_scheduler.cancel(invoice_id)
     return {"message": "Invoice deleted"}
 
 #--- Endpoint untuk tracking pembayaran ---
 @router.post("/{workspace_id}/invoices/{invoice_id}/mark-paid")
-def mark_invoice_paid(
+async def mark_invoice_paid(
     workspace_id: int,
     invoice_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("invoices").update({"status": "paid"}).eq("id", invoice_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("invoices").update({"status": "paid"}).eq("id", invoice_id).eq("workspace_id", workspace_id).execute()
     if not response.data:
         raise HTTPException(404, "Invoice not found")
     
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "invoices")
+    invoice_scheduler.cancel(invoice_id)
     return {"message": "Invoice marked as paid"}
 
 #--- Endpoint untuk Laporan Invoice ---
+@router.get("/{workspace_id}/invoices/aging")
+async def get_invoice_aging(
+    workspace_id: int,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    # Dibaca dari tabel invoice_aging (bucket sudah dihitung), bukan dari semua invoice
+    return await invoice_aging.get_report(supabase, workspace_id)
+
 @router.get("/{workspace_id}/invoices/reports")
-def get_invoice_report(
+async def get_invoice_report(
     workspace_id: int,
     start_date: str = None,
     end_date: str = None,
+    group_by_month: bool = False,
+    include_rows: bool = False,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
+    # Count & sum dihitung di database (RPC invoice_report)
+    report_query = supabase.rpc("invoice_report", {
+        "p_workspace_id": workspace_id,
+        "p_start_date": start_date,
+        "p_end_date": end_date,
+        "p_by_month": group_by_month
+    })
+    if not include_rows:
+        return (await report_query.execute()).data
+    
     query = supabase.table("invoices").select(
         "id, amount, due_date, status, payment_method"
     ).eq("workspace_id", workspace_id)
@@ -162,9 +238,8 @@ def get_invoice_report(
     if end_date:
         query = query.lte("due_date", end_date)
         
-    response = query.execute()
+    report, response = await asyncio.gather(report_query.execute(), query.execute())
     return {
-        "total_invoices": len(response.data),
-        "total_amount": sum(inv["amount"] for inv in response.data),
+        **report.data,
         "data": response.data
     }
@@ -1,20 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from datetime import datetime
-from supabase import Client
+from typing import List
+import uuid
+import numpy as np
+from postgrest.types import ReturnMethod
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core.export import EXPORT_FORMAT_PATTERN, export_response, iter_rows
+from app.core import salary
+from app.core.payslips import zip_payslips
+from app.core.references import references
+from app.core.payroll_history import payroll_history, simulate
 
 router = APIRouter(prefix="/workspaces")
 
 @router.get("/{workspace_id}/payroll")
-def get_payroll(
+async def get_payroll(
     workspace_id: int,
     start_date: str = None,
     end_date: str = None,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     query = supabase.table("payroll").select(
@@ -26,11 +40,35 @@ def get_payroll(
     if end_date:
         query = query.lte("pay_date", end_date)
         
-    response = query.execute()
-    return response.data
+    return await paginate(query, "pay_date", cursor, limit)
+
+PAYROLL_EXPORT_COLUMNS = ["id", "employee_id", "gross_salary", "deductions", "net_salary", "pay_date"]
+
+@router.get("/{workspace_id}/payroll/export")
+async def export_payroll(
+    workspace_id: int,
+    format: str = Query("ndjson", regex=EXPORT_FORMAT_PATTERN),
+    start_date: str = None,
+    end_date: str = None,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    def build_query(client):
+        query = client.table("payroll").select(", ".join(PAYROLL_EXPORT_COLUMNS)).eq("workspace_id", workspace_id)
+        if start_date:
+            query = query.gte("pay_date", start_date)
+        if end_date:
+            query = query.lte("pay_date", end_date)
+        return query
+    
+    rows = iter_rows(build_query, "pay_date")
+    return export_response(rows, format, PAYROLL_EXPORT_COLUMNS, f"payroll-{workspace_id}")
 
 @router.post("/{workspace_id}/payroll")
-def create_payroll(
+async def create_payroll(
     workspace_id: int,
     employee_id: str,
     gross_salary: float,
@@ -40,55 +78,198 @@ def create_payroll(
     hours_rate_c: float = 0.0,
     deductions: float = 0.0,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     # Validasi employee_id
-    employee = supabase.table("employees").select("id").eq("id", employee_id).eq("workspace_id", workspace_id).execute()
-    if not employee.data:
-        raise HTTPException(400, "Employee not found")
+    await references.require(supabase, workspace_id, employees=employee_id)
     # validasi jam kerja
     if hours_rate_a < 0 or hours_rate_b < 0 or hours_rate_c < 0:
         raise HTTPException(400, "Work hours cannot negative value!")
     
     # Hitung gaji
-    RATE_A = 20000
-    RATE_B = RATE_A * 2
-    RATE_C = RATE_A * 3
-    
-    gross_salary = (
-        (hours_rate_a * RATE_A) +
-        (hours_rate_b * RATE_B) +
-        (hours_rate_c * RATE_C) 
-    )
-    
-    deductions = gross_salary * 0.03
-    net_salary = gross_salary - deductions
+    amounts = salary.compute(hours_rate_a, hours_rate_b, hours_rate_c)
     
     data = {
         "employee_id": employee_id,
         "workspace_id": workspace_id,
-        "gross_salary": gross_salary,
-        "deductions": deductions,
-        "net_salary": net_salary,
-        "pay_date": pay_date
+        "gross_salary": float(amounts["gross_salary"]),
+        "deductions": float(amounts["deductions"]),
+        "net_salary": float(amounts["net_salary"]),
+        "pay_date": pay_date,
+        "hours_rate_a": hours_rate_a,
+        "hours_rate_b": hours_rate_b,
+        "hours_rate_c": hours_rate_c
     }
     
-    response = supabase.table("payroll").insert(data).execute()
+    response = await supabase.table("payroll").insert(data).execute()
+    payroll_history.invalidate(workspace_id)
     return response.data[0]
 
+# --- Payroll Run (massal) ---
+PAYROLL_INSERT_CHUNK = 1000
+
+class PayrollRunEntry(BaseModel):
+    employee_id: str
+    hours_rate_a: float
+    hours_rate_b: float = 0.0
+    hours_rate_c: float = 0.0
+
+class PayrollRunInput(BaseModel):
+    pay_date: str # Format: YYYY-MM-DD
+    entries: List[PayrollRunEntry]
+
+@router.post("/{workspace_id}/payroll/runs")
+async def create_payroll_run(
+    workspace_id: int,
+    data: PayrollRunInput,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    if not data.entries:
+        raise HTTPException(400, "Entries cannot be empty")
+    
+    errors = []
+    
+    def reject(index, entry, message):
+        errors.append({"index": index, "employee_id": entry.employee_id, "error": message})
+    
+    # Validasi semua karyawan dalam satu lookup
+    known = (await references.existing(
+        supabase, workspace_id, {"employees": [entry.employee_id for entry in data.entries]}
+    ))["employees"]
+    valid, seen = [], set()
+    for index, entry in enumerate(data.entries):
+        if entry.employee_id not in known:
+            reject(index, entry, "Employee not found")
+        elif entry.employee_id in seen:
+            reject(index, entry, "Duplicate employee in run")
+        elif entry.hours_rate_a < 0 or entry.hours_rate_b < 0 or entry.hours_rate_c < 0:
+            reject(index, entry, "Work hours cannot negative value!")
+        else:
+            seen.add(entry.employee_id)
+            valid.append((index, entry))
+    
+    # Hitung gaji semua karyawan sekaligus
+    run_id = str(uuid.uuid4())
+    rows, amounts = [], {}
+    if valid:
+        hours = np.array(
+            [(entry.hours_rate_a, entry.hours_rate_b, entry.hours_rate_c) for _, entry in valid],
+            dtype=np.float64
+        )
+        amounts = salary.compute(hours[:, 0], hours[:, 1], hours[:, 2])
+        gross, deductions, net = (amounts[column].tolist() for column in ("gross_salary", "deductions", "net_salary"))
+        rows = [
+            {
+                "employee_id": entry.employee_id,
+                "workspace_id": workspace_id,
+                "run_id": run_id,
+                "gross_salary": gross[i],
+                "deductions": deductions[i],
+                "net_salary": net[i],
+                "pay_date": data.pay_date,
+                "hours_rate_a": entry.hours_rate_a,
+                "hours_rate_b": entry.hours_rate_b,
+                "hours_rate_c": entry.hours_rate_c
+            }
+            for i, (_, entry) in enumerate(valid)
+        ]
+    
+    # Insert per potongan; potongan yang gagal dilaporkan per baris, sisanya tetap jalan
+    inserted = np.zeros(len(rows), dtype=bool)
+    for start in range(0, len(rows), PAYROLL_INSERT_CHUNK):
+        chunk = rows[start:start + PAYROLL_INSERT_CHUNK]
+        try:
+            await supabase.table("payroll").insert(chunk, returning=ReturnMethod.minimal).execute()
+            inserted[start:start + PAYROLL_INSERT_CHUNK] = True
+        except Exception as e:
+            message = f"Insert failed: {getattr(e, 'message', None) or e}"
+            for index, entry in valid[start:start + PAYROLL_INSERT_CHUNK]:
+                reject(index, entry, message)
+    if inserted.any():
+        payroll_history.invalidate(workspace_id)
+    
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "run_id": run_id,
+        "pay_date": data.pay_date,
+        "total": len(data.entries),
+        "inserted": int(inserted.sum()),
+        "failed": len(errors),
+        "totals": {column: float(values[inserted].sum()) for column, values in amounts.items()},
+        "errors": errors
+    }
+
+@router.delete("/{workspace_id}/payroll/runs/{run_id}")
+async def delete_payroll_run(
+    workspace_id: int,
+    run_id: str,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    response = await supabase.table("payroll").delete(returning=ReturnMethod.minimal, count="exact").eq("run_id", run_id).eq("workspace_id", workspace_id).execute()
+    payroll_history.invalidate(workspace_id)
+    if not response.count:
+        raise HTTPException(404, "Payroll run not found")
+    return {"message": "Payroll run deleted", "deleted": response.count}
+
+# --- Simulasi tarif (tanpa menulis apa pun) ---
+class PayrollSimulationInput(BaseModel):
+    rate_a: float = salary.RATE_A
+    rate_b: float = None # Default: 2x rate_a
+    rate_c: float = None # Default: 3x rate_a
+    deduction_rate: float = salary.DEDUCTION_RATE
+    start_date: str = None
+    end_date: str = None
+
+@router.post("/{workspace_id}/payroll/simulations")
+async def simulate_payroll(
+    workspace_id: int,
+    data: PayrollSimulationInput,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    rates = (
+        data.rate_a,
+        data.rate_a * 2 if data.rate_b is None else data.rate_b,
+        data.rate_a * 3 if data.rate_c is None else data.rate_c
+    )
+    if min(rates) < 0:
+        raise HTTPException(400, "Rates cannot negative value!")
+    if not 0 <= data.deduction_rate <= 1:
+        raise HTTPException(400, "Deduction rate must be between 0-1")
+    
+    columns = await payroll_history.load(supabase, workspace_id)
+    try:
+        result = simulate(columns, rates, data.deduction_rate, data.start_date, data.end_date)
+    except ValueError:
+        raise HTTPException(400, "Invalid date format, use YYYY-MM-DD")
+    return {
+        "parameters": {"rates": rates, "deduction_rate": data.deduction_rate},
+        **result
+    }
+
 @router.put("/{workspace_id}/payroll/{payroll_id}")
-def update_payroll(
+async def update_payroll(
     workspace_id: int,
     payroll_id: str,
     gross_salary: float = None,
     deductions: float = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
     updates = {}
@@ -103,37 +284,74 @@ def update_payroll(
             updates.get("deductions", deductions)
         )
         
-    response = supabase.table("payroll").update(updates).eq("id", payroll_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("payroll").update(updates).eq("id", payroll_id).eq("workspace_id", workspace_id).execute()
+    payroll_history.invalidate(workspace_id)
     if not response.data:
         raise HTTPException(404, "Payroll entry not found")
     return response.data[0]
 
 @router.delete("/{workspace_id}/payroll/{payroll_id}")
-def delete_payroll(
+async def delete_payroll(
     workspace_id: int,
     payroll_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("payroll").delete().eq("id", payroll_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("payroll").delete().eq("id", payroll_id).eq("workspace_id", workspace_id).execute()
+    payroll_history.invalidate(workspace_id)
     if not response.data:
         raise HTTPException(404, "Payroll entry not found")
     return {"message": "Payroll entry deleted"}
 
+@router.get("/{workspace_id}/payroll/slips")
+async def export_payslips(
+    workspace_id: int,
+    pay_date: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    if not (pay_date or start_date or end_date):
+        raise HTTPException(400, "pay_date or start_date/end_date is required")
+    
+    def build_query(client):
+        query = client.table("payroll").select(
+            "id, employee_id, gross_salary, deductions, net_salary, pay_date, employees(name)"
+        ).eq("workspace_id", workspace_id)
+        if pay_date:
+            query = query.eq("pay_date", pay_date)
+        if start_date:
+            query = query.gte("pay_date", start_date)
+        if end_date:
+            query = query.lte("pay_date", end_date)
+        return query
+    
+    # Slip HTML dirender di process pool dan di-stream sebagai ZIP
+    period = pay_date or f"{start_date or 'start'}_{end_date or 'end'}"
+    filename = f"payslips-{workspace_id}-{period}"
+    return StreamingResponse(
+        zip_payslips(iter_rows(build_query, "pay_date")),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.zip"'}
+    )
+
 @router.get("/{workspace_id}/payroll/{payroll_id}/slip")
-def generate_payslip(
+async def generate_payslip(
     workspace_id: int,
     payroll_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("payroll").select(
+    response = await supabase.table("payroll").select(
         "id, employee_id, gross_salary, deductions, net_salary, pay_date"
     ).eq("id", payroll_id).eq("workspace_id", workspace_id).execute()
     
@@ -1,59 +1,67 @@
-from fastapi import APIRouter, HTTPException, Depends
-from supabase import Client
+from fastapi import APIRouter, HTTPException, Depends, Request
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.auth import get_current_user, has_permission
+from app.core.pagination import limit_param, paginate
+from app.core.references import references
+from app.core.project_financials import project_financials
+from app.core.response_cache import response_cache
 
 router = APIRouter(prefix="/workspaces")
 
 @router.get("/{workspace_id}/projects")
-def get_projects(
+async def get_projects(
     workspace_id: int,
+    request: Request,
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("projects").select("*").eq("workspace_id", workspace_id).execute()
-    return response.data
+    query = supabase.table("projects").select("*").eq("workspace_id", workspace_id)
+    return await response_cache.respond(
+        request, supabase, current_user, workspace_id, "projects",
+        lambda: paginate(query, cursor=cursor, limit=limit)
+    )
 
 @router.post("/{workspace_id}/projects")
-def create_project(
+async def create_project(
     workspace_id: int,
     name: str,
     contact_id: str = None, # Baru: terkait CRM contact
     description: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    if contact_id:
-        # validasi contact ada di workspace
-        contact = supabase.table("crm_contacts").select("id").eq("id", contact_id).eq("workspace_id", workspace_id).execute()
-        if not contact.data:
-            raise HTTPException(400, "Contact not found")
+    # validasi contact ada di workspace
+    await references.require(supabase, workspace_id, crm_contacts=contact_id)
     
     data = {
         "name": name,
         "description": description,
         "workspace_id": workspace_id
     }
-    response = supabase.table("projects").insert(data).execute()
+    response = await supabase.table("projects").insert(data).execute()
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "projects")
     return response.data[0]
 
 @router.put("/{workspace_id}/projects/{project_id}")
-def update_project(
+async def update_project(
     workspace_id: int,
     project_id: int,
     name: str = None,
     description: str = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = get_supabase()
-
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
         
     # Data yang akan di update
@@ -64,70 +72,102 @@ def update_project(
         updates["description"] = description
         
     # Lakukan update
-    response = supabase.table("projects").update(updates).eq("id", project_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("projects").update(updates).eq("id", project_id).eq("workspace_id", workspace_id).execute()
     
     if not response.data:
         raise HTTPException(status_code=404, detail="Project not found")
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "projects")
     return response.data[0]
     
 @router.delete("/{workspace_id}/projects/{project_id}")
-def delete_project(
+async def delete_project(
     workspace_id: int,
     project_id: int,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     # Hapus proyek
-    response = supabase.table("projects").delete().eq("id", project_id).eq("workspace_id", workspace_id).execute()
+    response = await supabase.table("projects").delete().eq("id", project_id).eq("workspace_id", workspace_id).execute()
+    references.forget(workspace_id, "projects", project_id)
+    project_financials.invalidate(workspace_id)
+    response_cache.bump(workspace_id, "projects")
     
-    if response.data:
+    if not response.data:
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted"}
 
+@router.get("/{workspace_id}/projects/financials")
+async def get_portfolio_financials(
+    workspace_id: int,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    # Satu query ter-grup (RPC project_financials), hasilnya di-cache per workspace
+    return await project_financials.portfolio(supabase, workspace_id)
+
+@router.get("/{workspace_id}/projects/{project_id}/financials")
+async def get_project_financials(
+    workspace_id: int,
+    project_id: str,
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    financials = await project_financials.project(supabase, workspace_id, project_id)
+    if financials is None:
+        raise HTTPException(404, "Project not found")
+    return financials
+
 @router.get("/{workspace_id}/projects/{project_id}/contracts")
-def get_project_contracts(
+async def get_project_contracts(
     workspace_id: int,
     project_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("contracts").select(
+    response = await supabase.table("contracts").select(
         "*"
     ).eq("workspace_id", workspace_id).eq("project_id", project_id).execute()
     return response.data
 
 @router.get("/{workspace_id}/projects/{project_id}/crm")
-def get_project_crm(
+async def get_project_crm(
     workspace_id: int,
     project_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("projects").select(
+    response = await supabase.table("projects").select(
         "contact_id, contracts!inner(*)" # Join dengan kontrak
     ).eq("id", project_id).eq("workspace_id", workspace_id).execute()
     
     return response.data[0]
 
 @router.get("/{workspace_id}/projects/{project_id}/invoices")
-def get_project_invoices(
+async def get_project_invoices(
     workspace_id: int,
     project_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not has_permission(current_user, workspace_id):
+    if not await has_permission(current_user, workspace_id, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("invoices").select(
+    response = await supabase.table("invoices").select(
         "id, amount, due_date, status"
     ).eq("project_id", project_id).eq("workspace_id", workspace_id).execute()
     
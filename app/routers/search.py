@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from supabase import AsyncClient
+from app.database import get_supabase
+from app.core.auth import get_current_user, has_permission
+from app.core.search import SEARCH_ENTITIES, SEARCH_MODE_PATTERN, ranked_search
+
+router = APIRouter(prefix="/workspaces")
+
+@router.get("/{workspace_id}/search")
+async def search_workspace(
+    workspace_id: int,
+    q: str,
+    mode: str = Query("full", regex=SEARCH_MODE_PATTERN), # prefix = typeahead
+    types: str = None, # Contoh: types=customers,projects (default semua)
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    if not await has_permission(current_user, workspace_id, supabase):
+        raise HTTPException(403, "Forbidden")
+    
+    entities = None
+    if types:
+        entities = sorted({entity.strip() for entity in types.split(",") if entity.strip()})
+        unknown = set(entities) - set(SEARCH_ENTITIES)
+        if unknown:
+            raise HTTPException(400, f"Unknown types: {', '.join(sorted(unknown))}")
+    if not q.strip():
+        return {"data": [], "next_cursor": None}
+    
+    # Satu RPC ke search_index: hit bertipe dari semua entitas, sudah diurutkan berdasarkan rank
+    return await ranked_search(supabase, "search_workspace", workspace_id, q, mode, limit, types=entities)
@@ -1,44 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.core.config import settings
 from app.core.auth import oauth2_scheme, get_current_user
-from typing import List
+from app.core.permissions import memberships
+from app.core.pagination import limit_param, paginate
 
 router = APIRouter(prefix="/users")
     
-def is_workspace_admin(user):
-    return user.role == 'admin'
+async def is_workspace_admin(user, supabase: AsyncClient):
+    return await memberships.get_role(supabase, user["id"]) == 'admin'
 
-def is_manager(user):
-    return user.role == 'manager'
+async def is_manager(user, supabase: AsyncClient):
+    return await memberships.get_role(supabase, user["id"]) == 'manager'
 
-def is_staff(user):
-    return user.role == 'guest'
+async def is_staff(user, supabase: AsyncClient):
+    return await memberships.get_role(supabase, user["id"]) == 'guest'
 
-@router.get("/", response_model=List[dict])
-def get_users(
+@router.get("/", response_model=dict)
+async def get_users(
+    cursor: str = None,
+    limit: int = limit_param(),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if current_user['role'] == 'admin':
+    if await is_workspace_admin(current_user, supabase):
         # Admin bisa melihat semua user
-        response = supabase.table("users").select("*").execute()
+        query = supabase.table("users").select("*")
     else:
         # User lain hanya bisa melihat diri sendiri
-        response = supabase.table("users").select("*").eq("id", current_user['id']).execute()
-    return response.data
+        query = supabase.table("users").select("*").eq("id", current_user['id'])
+    return await paginate(query, cursor=cursor, limit=limit)
 
 @router.post("/", response_model=dict)
-def create_user(
+async def create_user(
     full_name: str,
     email: str,
     workspace_id: int,
     role: str = 'guest',
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not is_workspace_admin(current_user):
+    if not await is_workspace_admin(current_user, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
     data = {
@@ -47,19 +50,20 @@ def create_user(
         "role": role,
         "workspace_id": workspace_id
     }
-    response = supabase.table("users").insert(data).execute()
+    response = await supabase.table("users").insert(data).execute()
+    memberships.invalidate_user(response.data[0]["id"])
     return response.data[0]
 
 @router.put("/{user_id}", response_model=dict)
-def update_user(
+async def update_user(
     user_id: str,
     full_name: str = None,
     role: str = None,
     workspace_id: int = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not is_workspace_admin(current_user):
+    if not await is_workspace_admin(current_user, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
     updates = {}
@@ -70,37 +74,39 @@ def update_user(
     if workspace_id:
         updates["workspace_id"] = workspace_id
         
-    response = supabase.table("users").update(updates).eq("id", user_id).execute()
+    response = await supabase.table("users").update(updates).eq("id", user_id).execute()
+    memberships.invalidate_user(user_id)
     if response.data:
         return response.data[0]
     else:
         raise HTTPException(status_code=404, detail="User not found") 
     
 @router.delete("/{user_id}", response_model=dict)
-def delete_user(
+async def delete_user(
     user_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if not is_workspace_admin(current_user):
+    if not await is_workspace_admin(current_user, supabase):
         raise HTTPException(status_code=403, detail="Forbidden")
     
-    response = supabase.table("users").delete().eq("id", user_id).execute()
+    response = await supabase.table("users").delete().eq("id", user_id).execute()
+    memberships.invalidate_user(user_id)
     if response.data:
         return {"message": "User deleted"}
     else:
         raise HTTPException(status_code=404, detail="User not found")
     
 @router.get("/me")
-def get_profile(current_user: dict = Depends(get_current_user)):
+async def get_profile(current_user: dict = Depends(get_current_user)):
     return current_user
 
 @router.put("/me")
-def update_profile(
+async def update_profile(
     full_name: str = None,
     workspace_id: int = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     user_id = current_user["id"]
     updates = {}
@@ -109,19 +115,20 @@ def update_profile(
     if workspace_id:
         updates["workspace_id"] = workspace_id
         
-    response = supabase.table("users").update(updates).eq("id", user_id).execute()
+    response = await supabase.table("users").update(updates).eq("id", user_id).execute()
+    memberships.invalidate_user(user_id)
     if response.data:
         return {"message": "Profile updated", "data": response.data[0]}
     else:
         raise HTTPException(404, "User not found")
     
 @router.get("/all")
-def get_all_users(
+async def get_all_users(
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    if current_user["role"] != "admin":
+    if not await is_workspace_admin(current_user, supabase):
         raise HTTPException(403, "Forbidden")
     
-    response = supabase.table("users").select("*").execute()
+    response = await supabase.table("users").select("*").execute()
     return response.data[0]
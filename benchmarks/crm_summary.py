@@ -0,0 +1,85 @@
+# Benchmark: ringkasan CRM lewat RPC crm_summary vs menghitung di Python.
+#
+# Butuh database Supabase dengan migrasi supabase/migrations sudah dijalankan
+# dan .env terisi (SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY).
+#
+# Contoh (seed 500k kontak lalu ukur):
+#   python -m benchmarks.crm_summary --workspace-id 1 --seed 500000
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from postgrest.types import ReturnMethod
+from supabase import acreate_client
+from app.core.config import settings
+
+LEAD_STATUSES = ["prospect", "qualified", "proposal", "closed", "lost"]
+
+async def seed_contacts(supabase, workspace_id: int, total: int, chunk: int):
+    for start in range(0, total, chunk):
+        rows = [
+            {
+                "name": f"Bench Contact {i}",
+                "email": f"bench{i}@example.com",
+                "company": f"Company {i % 5000}",
+                "lead_status": random.choice(LEAD_STATUSES),
+                "source": "benchmark",
+                "workspace_id": workspace_id
+            }
+            for i in range(start, min(start + chunk, total))
+        ]
+        await supabase.table("crm_contacts").insert(rows, returning=ReturnMethod.minimal).execute()
+        print(f"seeded {min(start + chunk, total)}/{total}", end="\r")
+    print()
+
+async def summary_rpc(supabase, workspace_id: int):
+    return (await supabase.rpc("crm_summary", {"p_workspace_id": workspace_id}).execute()).data
+
+async def summary_python(supabase, workspace_id: int, page: int = 1000):
+    # Cara lama: tarik semua lead_status lalu hitung di Python
+    counts = {}
+    offset = 0
+    while True:
+        rows = (await supabase.table("crm_contacts").select("lead_status")
+                .eq("workspace_id", workspace_id).range(offset, offset + page - 1).execute()).data
+        for row in rows:
+            counts[row["lead_status"]] = counts.get(row["lead_status"], 0) + 1
+        if len(rows) < page:
+            return counts
+        offset += page
+
+async def timed(func, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:>8}: median {statistics.median(samples):9.1f} ms   p95 {p95:9.1f} ms   (n={len(samples)})")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workspace-id", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--python-runs", type=int, default=1)
+    args = parser.parse_args()
+
+    supabase = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+    if args.seed:
+        await seed_contacts(supabase, args.workspace_id, args.seed, args.chunk)
+
+    summary = await summary_rpc(supabase, args.workspace_id)
+    print("lead_status:", summary["lead_status"])
+
+    report("rpc", await timed(lambda: summary_rpc(supabase, args.workspace_id), args.runs))
+    report("python", await timed(lambda: summary_python(supabase, args.workspace_id), args.python_runs))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+# Benchmark: pencarian customer lewat RPC search_customers (index trigram/full-text)
+# vs ilike name/email tanpa index.
+#
+# Butuh database Supabase dengan migrasi supabase/migrations sudah dijalankan
+# dan .env terisi (SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY).
+#
+# Contoh (seed 1 juta customer lalu ukur):
+#   python -m benchmarks.customer_search --workspace-id 1 --seed 1000000
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from postgrest.types import ReturnMethod
+from supabase import acreate_client
+from app.core.config import settings
+
+FIRST_NAMES = ["Andi", "Budi", "Citra", "Dewi", "Eko", "Fitri", "Gilang", "Hana", "Indra", "Joko", "Kartika", "Lestari"]
+LAST_NAMES = ["Santoso", "Wijaya", "Saputra", "Halim", "Kusuma", "Pratama", "Nugroho", "Siregar", "Hidayat", "Gunawan"]
+QUERIES = {
+    "full": ["budi santoso", "wijaya", "company 1234", "bench42@example.com", "kusma"],
+    "prefix": ["bu", "wij", "compa", "dewi hal", "bench4"]
+}
+
+async def seed_customers(supabase, workspace_id: int, total: int, chunk: int):
+    for start in range(0, total, chunk):
+        rows = []
+        for i in range(start, min(start + chunk, total)):
+            name = f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
+            rows.append({
+                "name": f"{name} {i}",
+                "email": f"bench{i}@example.com",
+                "phone": f"08{random.randint(100000000, 999999999)}",
+                "company": f"Company {i % 5000}",
+                "workspace_id": workspace_id
+            })
+        await supabase.table("customers").insert(rows, returning=ReturnMethod.minimal).execute()
+        print(f"seeded {min(start + chunk, total)}/{total}", end="\r")
+    print()
+
+async def search_rpc(supabase, workspace_id: int, query: str, prefix: bool, limit: int):
+    return (await supabase.rpc("search_customers", {
+        "p_workspace_id": workspace_id,
+        "p_query": query,
+        "p_prefix": prefix,
+        "p_limit": limit
+    }).execute()).data
+
+async def search_ilike(supabase, workspace_id: int, query: str, limit: int):
+    # Cara lama: ilike name/email, sequential scan dan tanpa urutan relevansi
+    return (await supabase.table("customers").select("id, name, email, company, phone")
+            .eq("workspace_id", workspace_id)
+            .or_(f"name.ilike.\"*{query}*\",email.ilike.\"*{query}*\"")
+            .limit(limit).execute()).data
+
+async def timed(func, queries: list, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        for query in queries:
+            start = time.perf_counter()
+            await func(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:>8}: median {statistics.median(samples):9.1f} ms   p95 {p95:9.1f} ms   (n={len(samples)})")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workspace-id", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--ilike-runs", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    supabase = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+    if args.seed:
+        await seed_customers(supabase, args.workspace_id, args.seed, args.chunk)
+
+    for query in QUERIES["full"][:2]:
+        top = await search_rpc(supabase, args.workspace_id, query, False, 3)
+        print(f"{query!r}:", [(row["name"], round(row["rank"], 3)) for row in top])
+
+    workspace_id, limit = args.workspace_id, args.limit
+    report("full", await timed(lambda q: search_rpc(supabase, workspace_id, q, False, limit), QUERIES["full"], args.runs))
+    report("prefix", await timed(lambda q: search_rpc(supabase, workspace_id, q, True, limit), QUERIES["prefix"], args.runs))
+    report("ilike", await timed(lambda q: search_ilike(supabase, workspace_id, q, limit), QUERIES["full"], args.ilike_runs))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+# Benchmark: GET /workspaces/{id}/invoices lewat aplikasi FastAPI (ASGI), sync vs async.
+#
+# Menjalankan server PostgREST tiruan lokal dengan latency buatan, lalu mengirim
+# request HTTP ke route lewat httpx.ASGITransport (auth JWT HS256, cek membership,
+# query invoices):
+#   - async: app.main.app apa adanya (handler async + SupabasePool)
+#   - sync : handler def dengan query yang sama lewat client sync, dijalankan FastAPI
+#            di threadpool anyio (40 thread) seperti sebelum konversi async
+# Setiap request memakai project_id berbeda supaya response cache tidak kena
+# (pakai --cached untuk mengukur jalur cache).
+#
+# Contoh: python -m benchmarks.invoices_sync_vs_async --requests 2000 --concurrency 200
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+
+SELECT = "id, project_id, contract_id, amount, due_date, status, payment_method, notes"
+JWT_SECRET = "benchmark-secret"
+
+def make_body(rows: int) -> bytes:
+    return json.dumps([
+        {
+            "id": str(i),
+            "project_id": None,
+            "contract_id": None,
+            "amount": 100000.0,
+            "due_date": "2026-12-31",
+            "status": "pending",
+            "payment_method": "transfer",
+            "notes": None,
+        }
+        for i in range(rows)
+    ]).encode()
+
+def http_response(body: bytes) -> bytes:
+    return (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+    )
+
+async def serve_async(port, latency: float, rows: int):
+    invoices = http_response(make_body(rows))
+    membership = http_response(json.dumps([{"role": "member"}]).encode())
+
+    async def handle(reader, writer):
+        # Keep-alive: layani request GET berturut-turut di koneksi yang sama
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1]
+                await asyncio.sleep(latency)
+                writer.write(membership if path.startswith(b"/rest/v1/users") else invoices)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=1024)
+    port.value = server.sockets[0].getsockname()[1]
+    await server.serve_forever()
+
+def serve(port, latency: float, rows: int):
+    asyncio.run(serve_async(port, latency, rows))
+
+def start_server(latency: float, rows: int):
+    # Server tiruan di proses terpisah supaya tidak berebut GIL dengan aplikasi
+    port = multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(target=serve, args=(port, latency, rows), daemon=True)
+    process.start()
+    while not port.value:
+        time.sleep(0.01)
+    return process, port.value
+
+def sync_app(base_url: str, threads: int):
+    # Handler def (threadpool) dengan langkah yang sama: verifikasi token, membership, query
+    import httpx
+    from fastapi import Depends, FastAPI, HTTPException
+    from postgrest import SyncPostgrestClient
+    from jose import jwt
+    from app.core.auth import oauth2_scheme
+    from app.core.config import settings
+
+    limits = httpx.Limits(max_connections=threads, max_keepalive_connections=threads)
+    headers = {"apikey": settings.SUPABASE_SERVICE_ROLE_KEY, "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}"}
+    client = SyncPostgrestClient(
+        f"{base_url}/rest/v1", headers=headers,
+        http_client=httpx.Client(base_url=f"{base_url}/rest/v1", headers=headers, limits=limits)
+    )
+    app = FastAPI()
+    # Membership di-cache seperti MembershipResolver, supaya yang dibandingkan hanya sync vs async
+    members = {}
+
+    def get_current_user(token: str = Depends(oauth2_scheme)):
+        claims = jwt.decode(token, settings.SUPABASE_JWT_SECRET, algorithms=["HS256"], audience=settings.SUPABASE_JWT_AUDIENCE)
+        return {"id": claims["sub"]}
+
+    @app.get("/workspaces/{workspace_id}/invoices")
+    def get_invoices(workspace_id: int, project_id: str = None, current_user: dict = Depends(get_current_user)):
+        key = (current_user["id"], workspace_id)
+        if key not in members:
+            response = client.from_("users").select("role").eq("id", current_user["id"]).eq("workspace_id", workspace_id).limit(1).execute()
+            members[key] = response.data[0]["role"] if response.data else None
+        if members[key] is None:
+            raise HTTPException(403, "Forbidden")
+        query = client.from_("invoices").select(SELECT).eq("workspace_id", workspace_id)
+        if project_id:
+            query = query.eq("project_id", project_id)
+        return query.order("due_date").order("id").limit(51).execute().data
+
+    return app, client
+
+async def run(app, token: str, total: int, concurrency: int, cached: bool) -> float:
+    import httpx
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+        async def get_invoices(i):
+            params = {} if cached else {"project_id": str(i)}
+            async with semaphore:
+                response = await client.get("/workspaces/1/invoices", params=params)
+            if response.status_code not in (200, 304):
+                raise RuntimeError(f"{response.status_code}: {response.text}")
+
+        await get_invoices(-1)  # pemanasan: pool, cache token & membership
+        start = time.perf_counter()
+        await asyncio.gather(*(get_invoices(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--cached", action="store_true")
+    args = parser.parse_args()
+
+    server, port = start_server(args.latency, args.rows)
+    base_url = f"http://127.0.0.1:{port}"
+    # Settings dibaca saat import app, jadi environment diisi sebelum import
+    os.environ.update({
+        "SUPABASE_URL": base_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "benchmark-service-role",
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "SUPABASE_POOL_SIZE": str(args.concurrency),
+    })
+    from jose import jwt
+    from app.core.config import settings
+    from app.main import app
+
+    token = jwt.encode(
+        {"sub": "benchmark-user", "aud": settings.SUPABASE_JWT_AUDIENCE, "exp": int(time.time()) + 3600},
+        JWT_SECRET, algorithm="HS256"
+    )
+    baseline, client = sync_app(base_url, args.threads)
+    sync_rps = asyncio.run(run(baseline, token, args.requests, args.concurrency, args.cached))
+    client.session.close()
+    async_rps = asyncio.run(run(app, token, args.requests, args.concurrency, args.cached))
+    server.terminate()
+
+    print(f"sync  ({args.threads} threads): {sync_rps:8.1f} req/s")
+    print(f"async ({args.concurrency} in-flight): {async_rps:8.1f} req/s")
+    print(f"speedup: {async_rps / sync_rps:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Benchmark: ZIP slip gaji massal (5.000 slip), render berurutan vs process pool.
+#
+#   - sequential: render + zipfile.ZipFile (deflate) di satu proses, ZIP utuh di memori
+#   - pool      : app.core.payslips.zip_payslips (render + deflate di process pool,
+#                 ZIP di-stream per batch)
+#
+# Tidak butuh database: baris payroll dibuat sintetis.
+#
+# Contoh: python -m benchmarks.payslips_zip --slips 5000 --workers 4
+import argparse
+import asyncio
+import io
+import time
+import tracemalloc
+import zipfile
+from app.core import payslips
+from app.core.config import settings
+
+def make_rows(total: int) -> list:
+    return [
+        {
+            "id": str(i),
+            "employee_id": f"emp-{i:05d}",
+            "gross_salary": 4000000.0 + i,
+            "deductions": 120000.0,
+            "net_salary": 3880000.0 + i,
+            "pay_date": "2026-10-31",
+            "employees": {"name": f"Employee {i}"}
+        }
+        for i in range(total)
+    ]
+
+def run_sequential(rows: list):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for slip in rows:
+            archive.writestr(f"{slip['pay_date']}/{slip['employee_id']}-{slip['id']}.html", payslips.render_payslip(slip))
+    return len(buffer.getvalue()), len(rows)
+
+async def run_pool(rows: list):
+    async def source():
+        for row in rows:
+            yield row
+
+    size, largest_chunk = 0, 0
+    async for chunk in payslips.zip_payslips(source()):
+        size += len(chunk)
+        largest_chunk = max(largest_chunk, len(chunk))
+    return size, largest_chunk
+
+def measure(func):
+    # Waktu diukur tanpa tracemalloc (overhead-nya besar), memori di run terpisah
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slips", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    settings.PAYSLIP_WORKERS = args.workers
+    settings.PAYSLIP_BATCH_SIZE = args.batch_size
+    rows = make_rows(args.slips)
+
+    # Panaskan process pool supaya waktu spawn worker tidak ikut terukur
+    payslips.executor().submit(payslips.render_batch, rows[:1]).result()
+
+    (size, _), seq_elapsed, seq_peak = measure(lambda: run_sequential(rows))
+    print(f"sequential: {seq_elapsed:6.2f} s  {args.slips / seq_elapsed:8.0f} slips/s  zip {size / 1024:8.0f} KB  peak mem {seq_peak / 1024:8.0f} KB")
+
+    (size, largest), pool_elapsed, pool_peak = measure(lambda: asyncio.run(run_pool(rows)))
+    print(f"pool ({payslips.worker_count()}w):  {pool_elapsed:6.2f} s  {args.slips / pool_elapsed:8.0f} slips/s  zip {size / 1024:8.0f} KB  peak mem {pool_peak / 1024:8.0f} KB  (largest chunk {largest / 1024:.0f} KB)")
+    print(f"speedup: {seq_elapsed / pool_elapsed:.2f}x")
+    payslips.shutdown_executor()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+-- Agregat dashboard per workspace, di-update inkremental oleh trigger tabel sumber
+-- dan dihitung ulang berkala oleh reconcile_workspace_metrics().
+create table if not exists workspace_metrics (
+    workspace_id bigint primary key references workspaces(id) on delete cascade,
+    total_contacts bigint not null default 0,
+    total_opportunities bigint not null default 0,
+    total_invoices bigint not null default 0,
+    pending_invoices bigint not null default 0,
+    overdue_invoices bigint not null default 0,
+    amount_owed numeric not null default 0,
+    amount_paid numeric not null default 0,
+    updated_at timestamptz not null default now(),
+    reconciled_at timestamptz
+);
+
+-- Workspace yang belum punya baris dihitung penuh (reconcile), bukan diisi dengan
+-- selisihnya saja: baris baru yang hanya berisi delta (mis. total_contacts = 1)
+-- akan dianggap benar oleh get_metrics sampai reconcile berikutnya
+create or replace function increment_workspace_metrics(p_workspace_id bigint, p_deltas jsonb)
+returns void
+language plpgsql
+as $$
+begin
+    update workspace_metrics as m set
+        total_contacts = m.total_contacts + coalesce((p_deltas->>'total_contacts')::bigint, 0),
+        total_opportunities = m.total_opportunities + coalesce((p_deltas->>'total_opportunities')::bigint, 0),
+        total_invoices = m.total_invoices + coalesce((p_deltas->>'total_invoices')::bigint, 0),
+        pending_invoices = m.pending_invoices + coalesce((p_deltas->>'pending_invoices')::bigint, 0),
+        overdue_invoices = m.overdue_invoices + coalesce((p_deltas->>'overdue_invoices')::bigint, 0),
+        amount_owed = m.amount_owed + coalesce((p_deltas->>'amount_owed')::numeric, 0),
+        amount_paid = m.amount_paid + coalesce((p_deltas->>'amount_paid')::numeric, 0),
+        updated_at = now()
+    where m.workspace_id = p_workspace_id;
+    if not found then
+        -- Perubahan pemanggil sudah terlihat di transaksi ini, jadi ikut terhitung
+        perform reconcile_workspace_metrics(p_workspace_id);
+    end if;
+end;
+$$;
+
+-- p_workspace_id null = semua workspace
+create or replace function reconcile_workspace_metrics(p_workspace_id bigint default null)
+returns setof workspace_metrics
+language sql
+as $$
+    insert into workspace_metrics as m (
+        workspace_id, total_contacts, total_opportunities, total_invoices,
+        pending_invoices, overdue_invoices, amount_owed, amount_paid,
+        updated_at, reconciled_at
+    )
+    select
+        w.id,
+        (select count(*) from crm_contacts c where c.workspace_id = w.id),
+        (select count(*) from crm_opportunities o where o.workspace_id = w.id),
+        coalesce(i.total_invoices, 0),
+        coalesce(i.pending_invoices, 0),
+        coalesce(i.overdue_invoices, 0),
+        coalesce(i.amount_owed, 0),
+        coalesce(i.amount_paid, 0),
+        now(),
+        now()
+    from workspaces w
+    left join lateral (
+        select
+            count(*) as total_invoices,
+            count(*) filter (where status = 'pending') as pending_invoices,
+            count(*) filter (where status = 'overdue') as overdue_invoices,
+            sum(amount) filter (where status in ('pending', 'overdue')) as amount_owed,
+            sum(amount) filter (where status = 'paid') as amount_paid
+        from invoices
+        where invoices.workspace_id = w.id
+    ) i on true
+    where p_workspace_id is null or w.id = p_workspace_id
+    on conflict (workspace_id) do update set
+        total_contacts = excluded.total_contacts,
+        total_opportunities = excluded.total_opportunities,
+        total_invoices = excluded.total_invoices,
+        pending_invoices = excluded.pending_invoices,
+        overdue_invoices = excluded.overdue_invoices,
+        amount_owed = excluded.amount_owed,
+        amount_paid = excluded.amount_paid,
+        updated_at = excluded.updated_at,
+        reconciled_at = excluded.reconciled_at
+    returning *;
+$$;
+
+-- Backfill: semua workspace yang sudah ada langsung punya angka lengkap
+select reconcile_workspace_metrics();
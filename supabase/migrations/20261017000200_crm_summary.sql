@@ -0,0 +1,48 @@
+-- Ringkasan CRM per workspace dalam satu round trip:
+-- jumlah kontak per lead_status, opportunity open/closed beserta total nilainya.
+create index if not exists crm_contacts_workspace_lead_status_idx
+    on crm_contacts (workspace_id, lead_status);
+
+create index if not exists crm_opportunities_workspace_status_idx
+    on crm_opportunities (workspace_id, status) include (estimated_value);
+
+create index if not exists crm_interactions_workspace_date_idx
+    on crm_interactions (workspace_id, interaction_date desc);
+
+create or replace function crm_summary(p_workspace_id bigint, p_recent_limit int default 10)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'lead_status', coalesce((
+            select jsonb_object_agg(lead_status, total)
+            from (
+                select coalesce(lead_status, 'unknown') as lead_status, count(*) as total
+                from crm_contacts
+                where workspace_id = p_workspace_id
+                group by 1
+            ) s
+        ), '{}'::jsonb),
+        'opportunities', (
+            select jsonb_build_object(
+                'open', count(*) filter (where status = 'open'),
+                'closed', count(*) filter (where status is distinct from 'open'),
+                'open_value', coalesce(sum(estimated_value) filter (where status = 'open'), 0),
+                'closed_value', coalesce(sum(estimated_value) filter (where status is distinct from 'open'), 0)
+            )
+            from crm_opportunities
+            where workspace_id = p_workspace_id
+        ),
+        'recent_interactions', coalesce((
+            select jsonb_agg(i)
+            from (
+                select id, contact_id, type, notes, interaction_date
+                from crm_interactions
+                where workspace_id = p_workspace_id
+                order by interaction_date desc
+                limit p_recent_limit
+            ) i
+        ), '[]'::jsonb)
+    );
+$$;
@@ -0,0 +1,70 @@
+-- Agregasi laporan invoice & opportunity di database, bukan sum() di Python.
+create index if not exists invoices_workspace_due_date_idx
+    on invoices (workspace_id, due_date) include (amount, status, payment_method);
+
+create or replace function invoice_report(
+    p_workspace_id bigint,
+    p_start_date date default null,
+    p_end_date date default null,
+    p_by_month boolean default false
+)
+returns jsonb
+language sql
+stable
+as $$
+    with filtered as (
+        select amount, status, payment_method, due_date
+        from invoices
+        where workspace_id = p_workspace_id
+          and (p_start_date is null or due_date >= p_start_date)
+          and (p_end_date is null or due_date <= p_end_date)
+    )
+    select jsonb_build_object(
+        'total_invoices', (select count(*) from filtered),
+        'total_amount', (select coalesce(sum(amount), 0) from filtered),
+        'by_status', coalesce((
+            select jsonb_object_agg(status, jsonb_build_object('count', total, 'amount', amount))
+            from (
+                select coalesce(status, 'unknown') as status, count(*) as total, coalesce(sum(amount), 0) as amount
+                from filtered group by 1
+            ) s
+        ), '{}'::jsonb),
+        'by_payment_method', coalesce((
+            select jsonb_object_agg(payment_method, jsonb_build_object('count', total, 'amount', amount))
+            from (
+                select coalesce(payment_method, 'unknown') as payment_method, count(*) as total, coalesce(sum(amount), 0) as amount
+                from filtered group by 1
+            ) p
+        ), '{}'::jsonb),
+        'by_month', case when p_by_month then coalesce((
+            select jsonb_agg(jsonb_build_object('month', month, 'count', total, 'amount', amount) order by month)
+            from (
+                select to_char(date_trunc('month', due_date), 'YYYY-MM') as month, count(*) as total, coalesce(sum(amount), 0) as amount
+                from filtered group by 1
+            ) m
+        ), '[]'::jsonb) end
+    );
+$$;
+
+create index if not exists crm_opportunities_workspace_project_idx
+    on crm_opportunities (workspace_id, project_id) include (estimated_value);
+
+create or replace function opportunity_report(p_workspace_id bigint)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'total_opportunities', (select count(*) from crm_opportunities where workspace_id = p_workspace_id),
+        'total_value', (select coalesce(sum(estimated_value), 0) from crm_opportunities where workspace_id = p_workspace_id),
+        'by_project', coalesce((
+            select jsonb_agg(jsonb_build_object('project_id', project_id, 'count', total, 'value', value))
+            from (
+                select project_id, count(*) as total, coalesce(sum(estimated_value), 0) as value
+                from crm_opportunities
+                where workspace_id = p_workspace_id
+                group by project_id
+            ) p
+        ), '[]'::jsonb)
+    );
+$$;
@@ -0,0 +1,9 @@
+-- Payroll massal: setiap baris menyimpan jam kerja dan run_id dari batch yang membuatnya.
+alter table payroll
+    add column if not exists run_id uuid,
+    add column if not exists hours_rate_a numeric not null default 0,
+    add column if not exists hours_rate_b numeric not null default 0,
+    add column if not exists hours_rate_c numeric not null default 0;
+
+create index if not exists payroll_workspace_run_idx
+    on payroll (workspace_id, run_id) where run_id is not null;
@@ -0,0 +1,48 @@
+-- Upsert analytics (satu baris per project / employee per workspace):
+-- buang duplikat lama, lalu kunci unik untuk on_conflict PostgREST.
+-- Duplikat (kunci sama, bukan NULL) dibuang, baris terbaru dipertahankan. row_number()
+-- dipakai karena perbandingan (updated_at, id) < (...) bernilai NULL bila timestamp kosong.
+-- Baris dengan project_id / employee_id NULL tidak disentuh: index unik biasa
+-- menganggap NULL berbeda, jadi tidak bentrok.
+delete from project_analytics
+where id in (
+    select id
+    from (
+        select id, row_number() over (
+            partition by workspace_id, project_id
+            order by coalesce(updated_at, created_at) desc nulls last, id desc
+        ) as rn
+        from project_analytics
+        where project_id is not null
+    ) d
+    where rn > 1
+);
+
+delete from employee_analytics
+where id in (
+    select id
+    from (
+        select id, row_number() over (
+            partition by workspace_id, employee_id
+            order by coalesce(updated_at, created_at) desc nulls last, id desc
+        ) as rn
+        from employee_analytics
+        where employee_id is not null
+    ) d
+    where rn > 1
+);
+
+create unique index if not exists project_analytics_workspace_project_key
+    on project_analytics (workspace_id, project_id);
+
+create unique index if not exists employee_analytics_workspace_employee_key
+    on employee_analytics (workspace_id, employee_id);
+
+-- created_at diisi database saat insert, tidak ikut ter-update oleh upsert
+alter table project_analytics
+    alter column created_at set default now(),
+    alter column updated_at set default now();
+
+alter table employee_analytics
+    alter column created_at set default now(),
+    alter column updated_at set default now();
@@ -0,0 +1,54 @@
+-- Kontrak kedaluwarsa diproses per workspace dalam batch terbatas. Tidak ada
+-- watermark: index parsial hanya berisi kontrak yang belum expired, jadi setiap
+-- run hanya menyentuh kontrak yang benar-benar perlu diproses, termasuk yang
+-- dibuat / diubah belakangan dengan end_date lampau.
+drop table if exists contract_expiry_watermarks;
+
+create index if not exists contracts_workspace_end_date_active_idx
+    on contracts (workspace_id, end_date)
+    where status is distinct from 'expired';
+
+create or replace function expire_contracts(
+    p_workspace_id bigint,
+    p_today date default current_date,
+    p_batch_size int default 500
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_expired int;
+    v_has_more boolean;
+begin
+    with batch as (
+        select id
+        from contracts
+        where workspace_id = p_workspace_id
+          and end_date < p_today
+          and status is distinct from 'expired'
+        order by end_date, id
+        limit p_batch_size
+        for update skip locked
+    )
+    update contracts c
+    set status = 'expired'
+    from batch
+    where c.id = batch.id;
+    get diagnostics v_expired = row_count;
+
+    -- Dicek ulang tanpa skip locked (baris yang dikunci transaksi lain ikut terhitung).
+    -- Jika batch ini tidak meng-expire apa pun (sisanya terkunci), coba lagi di sapuan berikutnya
+    v_has_more := v_expired > 0 and exists (
+        select 1
+        from contracts
+        where workspace_id = p_workspace_id
+          and end_date < p_today
+          and status is distinct from 'expired'
+    );
+
+    return jsonb_build_object(
+        'expired', v_expired,
+        'has_more', v_has_more
+    );
+end;
+$$;
@@ -0,0 +1,47 @@
+-- Status overdue di-set oleh scheduler jatuh tempo (app/core/invoice_scheduler.py),
+-- jadi overdue cukup difilter dari kolom status (lihat reconcile_workspace_metrics()).
+
+-- Outbox event pengingat invoice; unik per (invoice, jenis) supaya aman dikirim ulang
+create table if not exists invoice_reminders (
+    id bigint generated always as identity primary key,
+    workspace_id bigint not null references workspaces(id) on delete cascade,
+    invoice_id uuid not null references invoices(id) on delete cascade,
+    kind text not null check (kind in ('due_soon', 'overdue')),
+    due_date date not null,
+    created_at timestamptz not null default now(),
+    processed_at timestamptz,
+    unique (invoice_id, kind)
+);
+
+create index if not exists invoice_reminders_unprocessed_idx
+    on invoice_reminders (workspace_id, created_at)
+    where processed_at is null;
+
+create index if not exists invoices_pending_due_date_idx
+    on invoices (due_date)
+    where status = 'pending';
+
+-- Lease job latar: hanya satu worker (holder) yang menjalankan scheduler. Advisory
+-- lock tidak bisa dipegang lintas request PostgREST (setiap RPC transaksi sendiri),
+-- jadi dipakai baris dengan masa berlaku yang diperpanjang holder di setiap tick.
+create table if not exists job_leases (
+    name text primary key,
+    holder text not null,
+    expires_at timestamptz not null
+);
+
+create or replace function acquire_job_lease(p_name text, p_holder text, p_ttl_seconds int)
+returns boolean
+language sql
+as $$
+    with acquired as (
+        insert into job_leases as l (name, holder, expires_at)
+        values (p_name, p_holder, now() + make_interval(secs => p_ttl_seconds))
+        on conflict (name) do update set
+            holder = excluded.holder,
+            expires_at = excluded.expires_at
+        where l.holder = excluded.holder or l.expires_at < now()
+        returning 1
+    )
+    select exists (select 1 from acquired);
+$$;
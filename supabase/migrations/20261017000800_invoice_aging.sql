@@ -0,0 +1,150 @@
+-- Aging piutang (current, 1-30, 31-60, 61-90, 90+ hari) per workspace, customer dan project.
+-- Di-update inkremental oleh trigger invoices (apply_invoice_aging_delta) dan
+-- digulir harian oleh rebuild_invoice_aging() karena umur invoice bertambah tiap hari.
+create table if not exists invoice_aging (
+    workspace_id bigint not null references workspaces(id) on delete cascade,
+    dimension text not null check (dimension in ('workspace', 'customer', 'project')),
+    dimension_id text not null default '',
+    bucket text not null,
+    invoice_count bigint not null default 0,
+    amount numeric not null default 0,
+    as_of date not null,
+    updated_at timestamptz not null default now(),
+    primary key (workspace_id, dimension, dimension_id, bucket)
+);
+
+create index if not exists invoices_workspace_open_idx
+    on invoices (workspace_id)
+    include (amount, due_date, project_id, contract_id)
+    where status in ('pending', 'overdue');
+
+create or replace function invoice_aging_bucket(p_due_date date, p_as_of date)
+returns text
+language sql
+immutable
+as $$
+    select case
+        when p_due_date is null or p_as_of - p_due_date <= 0 then 'current'
+        when p_as_of - p_due_date <= 30 then '1_30'
+        when p_as_of - p_due_date <= 60 then '31_60'
+        when p_as_of - p_due_date <= 90 then '61_90'
+        else '90_plus'
+    end;
+$$;
+
+create or replace function rebuild_invoice_aging(p_workspace_id bigint, p_as_of date default current_date)
+returns void
+language plpgsql
+as $$
+begin
+    -- Serialisasi dengan delta untuk workspace yang sama
+    perform pg_advisory_xact_lock(hashtextextended('invoice_aging:' || p_workspace_id, 0));
+
+    delete from invoice_aging where workspace_id = p_workspace_id;
+
+    insert into invoice_aging (workspace_id, dimension, dimension_id, bucket, invoice_count, amount, as_of)
+    with open_invoices as (
+        select
+            i.project_id::text as project_id,
+            c.customer_id::text as customer_id,
+            coalesce(i.amount, 0) as amount,
+            invoice_aging_bucket(i.due_date, p_as_of) as bucket
+        from invoices i
+        left join contracts c on c.id = i.contract_id
+        where i.workspace_id = p_workspace_id
+          and i.status in ('pending', 'overdue')
+    ),
+    buckets(bucket) as (
+        values ('current'), ('1_30'), ('31_60'), ('61_90'), ('90_plus')
+    )
+    -- Baris workspace selalu ada (juga yang nol) sehingga as_of selalu terbaca
+    select p_workspace_id, 'workspace', '', b.bucket, count(o.bucket), coalesce(sum(o.amount), 0), p_as_of
+    from buckets b
+    left join open_invoices o on o.bucket = b.bucket
+    group by b.bucket
+    union all
+    select p_workspace_id, 'customer', customer_id, bucket, count(*), sum(amount), p_as_of
+    from open_invoices
+    where customer_id is not null
+    group by customer_id, bucket
+    union all
+    select p_workspace_id, 'project', project_id, bucket, count(*), sum(amount), p_as_of
+    from open_invoices
+    where project_id is not null
+    group by project_id, bucket;
+end;
+$$;
+
+-- p_old / p_new: baris invoice sebelum / sesudah perubahan (null = tidak ada)
+create or replace function apply_invoice_aging_delta(p_workspace_id bigint, p_old jsonb, p_new jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    v_as_of date;
+    v_row jsonb;
+    v_sign int;
+    v_bucket text;
+    v_amount numeric;
+    v_customer_id text;
+begin
+    perform pg_advisory_xact_lock(hashtextextended('invoice_aging:' || p_workspace_id, 0));
+
+    select as_of into v_as_of
+    from invoice_aging
+    where workspace_id = p_workspace_id and dimension = 'workspace'
+    limit 1;
+    if v_as_of is null then
+        -- Belum pernah dibangun: akan dibangun penuh saat laporan pertama dibaca
+        return;
+    end if;
+
+    for v_row, v_sign in
+        select p_old, -1 where p_old is not null and p_old->>'status' in ('pending', 'overdue')
+        union all
+        select p_new, 1 where p_new is not null and p_new->>'status' in ('pending', 'overdue')
+    loop
+        v_bucket := invoice_aging_bucket((v_row->>'due_date')::date, v_as_of);
+        v_amount := v_sign * coalesce((v_row->>'amount')::numeric, 0);
+        select customer_id::text into v_customer_id
+        from contracts
+        where id::text = v_row->>'contract_id';
+
+        insert into invoice_aging as a (workspace_id, dimension, dimension_id, bucket, invoice_count, amount, as_of)
+        select p_workspace_id, d.dimension, d.dimension_id, v_bucket, v_sign, v_amount, v_as_of
+        from (values
+            ('workspace', ''),
+            ('customer', v_customer_id),
+            ('project', v_row->>'project_id')
+        ) as d(dimension, dimension_id)
+        where d.dimension_id is not null
+        on conflict (workspace_id, dimension, dimension_id, bucket) do update set
+            invoice_count = a.invoice_count + excluded.invoice_count,
+            amount = a.amount + excluded.amount,
+            updated_at = now();
+    end loop;
+
+    delete from invoice_aging
+    where workspace_id = p_workspace_id
+      and dimension <> 'workspace'
+      and invoice_count = 0;
+end;
+$$;
+
+-- Semua baris aging satu workspace dalam satu nilai (tidak terpotong batas max-rows PostgREST)
+create or replace function invoice_aging_rows(p_workspace_id bigint)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'dimension', dimension,
+        'dimension_id', dimension_id,
+        'bucket', bucket,
+        'invoice_count', invoice_count,
+        'amount', amount,
+        'as_of', as_of
+    )), '[]'::jsonb)
+    from invoice_aging
+    where workspace_id = p_workspace_id;
+$$;
@@ -0,0 +1,59 @@
+-- Rekap keuangan semua project satu workspace dalam satu query ter-grup:
+-- budget/actual_cost (project_analytics) + invoice + kontrak per project.
+create index if not exists invoices_workspace_project_idx
+    on invoices (workspace_id, project_id)
+    include (amount, status, contract_id);
+
+create index if not exists contracts_workspace_project_idx
+    on contracts (workspace_id, project_id)
+    include (status);
+
+create or replace function project_financials(p_workspace_id bigint)
+returns jsonb
+language sql
+stable
+as $$
+    with invoice_totals as (
+        select
+            project_id,
+            count(*) as invoice_count,
+            coalesce(sum(amount), 0) as invoiced,
+            coalesce(sum(amount) filter (where status = 'paid'), 0) as paid,
+            coalesce(sum(amount) filter (where status in ('pending', 'overdue')), 0) as outstanding,
+            -- Kontrak tidak punya kolom nilai: "contracted" = invoice yang terkait kontrak
+            coalesce(sum(amount) filter (where contract_id is not null), 0) as contracted
+        from invoices
+        where workspace_id = p_workspace_id
+          and project_id is not null
+        group by project_id
+    ),
+    contract_totals as (
+        select
+            project_id,
+            count(*) as contract_count,
+            count(*) filter (where status is distinct from 'expired') as active_contracts
+        from contracts
+        where workspace_id = p_workspace_id
+          and project_id is not null
+        group by project_id
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'project_id', p.id,
+        'name', p.name,
+        'budget', a.budget,
+        'actual_cost', a.actual_cost,
+        'progress', a.progress,
+        'invoice_count', coalesce(i.invoice_count, 0),
+        'invoiced', coalesce(i.invoiced, 0),
+        'paid', coalesce(i.paid, 0),
+        'outstanding', coalesce(i.outstanding, 0),
+        'contracted', coalesce(i.contracted, 0),
+        'contract_count', coalesce(c.contract_count, 0),
+        'active_contracts', coalesce(c.active_contracts, 0)
+    ) order by p.id), '[]'::jsonb)
+    from projects p
+    left join project_analytics a on a.workspace_id = p.workspace_id and a.project_id = p.id
+    left join invoice_totals i on i.project_id = p.id
+    left join contract_totals c on c.project_id = p.id
+    where p.workspace_id = p_workspace_id;
+$$;
@@ -0,0 +1,118 @@
+-- Pencarian customer & kontak CRM (name, email, company, phone) berbasis index:
+-- tsvector untuk kata utuh / prefix (typeahead), trigram untuk potongan kata & typo.
+-- Kolom generated pakai || + coalesce (concat_ws tidak immutable).
+create extension if not exists pg_trgm;
+create extension if not exists btree_gin;
+
+alter table customers
+    add column if not exists search_text text generated always as (
+        lower(coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || coalesce(phone, ''))
+    ) stored,
+    add column if not exists search_vector tsvector generated always as (
+        to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || coalesce(phone, ''))
+    ) stored;
+
+alter table crm_contacts
+    add column if not exists search_text text generated always as (
+        lower(coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || coalesce(phone, ''))
+    ) stored,
+    add column if not exists search_vector tsvector generated always as (
+        to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || coalesce(phone, ''))
+    ) stored;
+
+create index if not exists customers_search_vector_idx
+    on customers using gin (workspace_id, search_vector);
+create index if not exists customers_search_text_trgm_idx
+    on customers using gin (workspace_id, search_text gin_trgm_ops);
+
+create index if not exists crm_contacts_search_vector_idx
+    on crm_contacts using gin (workspace_id, search_vector);
+create index if not exists crm_contacts_search_text_trgm_idx
+    on crm_contacts using gin (workspace_id, search_text gin_trgm_ops);
+-- Filter company (ilike '%x%') di crm.search_contacts
+create index if not exists crm_contacts_company_trgm_idx
+    on crm_contacts using gin (workspace_id, company gin_trgm_ops);
+
+-- "jo smi" -> 'jo' & 'smi' (p_prefix: 'jo':* & 'smi':*)
+create or replace function search_tsquery(p_query text, p_prefix boolean default false)
+returns tsquery
+language sql
+immutable
+as $$
+    select nullif(string_agg(
+        quote_literal(token) || case when p_prefix then ':*' else '' end,
+        ' & '
+    ), '')::tsquery
+    from regexp_split_to_table(lower(coalesce(p_query, '')), '[^[:alnum:]@._+-]+') as token
+    where token <> '';
+$$;
+
+create or replace function search_like_pattern(p_query text)
+returns text
+language sql
+immutable
+as $$
+    select '%' || replace(replace(replace(lower(trim(p_query)), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+$$;
+
+-- p_prefix true = mode typeahead (prefix kata saja, paling cepat);
+-- false = kata utuh + potongan kata + mirip (trigram), diurutkan berdasarkan rank
+create or replace function search_customers(
+    p_workspace_id bigint,
+    p_query text,
+    p_prefix boolean default false,
+    p_company text default null,
+    p_limit int default 20
+)
+returns table (id text, name text, email text, company text, phone text, rank real)
+language sql
+stable
+as $$
+    with q as (
+        select search_tsquery(p_query, p_prefix) as tsq, lower(trim(p_query)) as term
+    )
+    select
+        c.id::text, c.name, c.email, c.company, c.phone,
+        greatest(ts_rank(c.search_vector, q.tsq), similarity(c.search_text, q.term))::real as rank
+    from customers c, q
+    where c.workspace_id = p_workspace_id
+      and (p_company is null or c.company = p_company)
+      and (
+          c.search_vector @@ q.tsq
+          or (not p_prefix and length(q.term) >= 3 and c.search_text like search_like_pattern(q.term))
+          or (not p_prefix and c.search_text % q.term)
+      )
+    order by rank desc, c.id
+    limit least(greatest(p_limit, 1), 100);
+$$;
+
+create or replace function search_contacts(
+    p_workspace_id bigint,
+    p_query text,
+    p_prefix boolean default false,
+    p_lead_status text default null,
+    p_company text default null,
+    p_limit int default 20
+)
+returns table (id text, name text, email text, company text, phone text, lead_status text, rank real)
+language sql
+stable
+as $$
+    with q as (
+        select search_tsquery(p_query, p_prefix) as tsq, lower(trim(p_query)) as term
+    )
+    select
+        c.id::text, c.name, c.email, c.company, c.phone, c.lead_status,
+        greatest(ts_rank(c.search_vector, q.tsq), similarity(c.search_text, q.term))::real as rank
+    from crm_contacts c, q
+    where c.workspace_id = p_workspace_id
+      and (p_lead_status is null or c.lead_status = p_lead_status)
+      and (p_company is null or c.company ilike search_like_pattern(p_company))
+      and (
+          c.search_vector @@ q.tsq
+          or (not p_prefix and length(q.term) >= 3 and c.search_text like search_like_pattern(q.term))
+          or (not p_prefix and c.search_text % q.term)
+      )
+    order by rank desc, c.id
+    limit least(greatest(p_limit, 1), 100);
+$$;
@@ -0,0 +1,138 @@
+-- Index pencarian lintas entitas per workspace (satu search box):
+-- customers, crm_contacts, projects, contracts, employees, invoices.
+-- Dijaga oleh trigger, jadi semua jalur tulis (router, RPC, job) ikut terindeks.
+create table if not exists search_index (
+    entity text not null,
+    entity_id text not null,
+    workspace_id bigint not null,
+    title text not null default '',
+    subtitle text not null default '',
+    body text not null default '',
+    search_text text generated always as (
+        lower(title || ' ' || subtitle || ' ' || body)
+    ) stored,
+    -- Bobot: judul > subjudul > isi
+    search_vector tsvector generated always as (
+        setweight(to_tsvector('simple', title), 'A')
+        || setweight(to_tsvector('simple', subtitle), 'B')
+        || setweight(to_tsvector('simple', body), 'C')
+    ) stored,
+    updated_at timestamptz not null default now(),
+    primary key (entity, entity_id)
+);
+
+create index if not exists search_index_vector_idx
+    on search_index using gin (workspace_id, search_vector);
+create index if not exists search_index_text_trgm_idx
+    on search_index using gin (workspace_id, search_text gin_trgm_ops);
+
+-- Baris tabel sumber (jsonb) -> (title, subtitle, body)
+create or replace function search_index_document(p_entity text, r jsonb)
+returns table (title text, subtitle text, body text)
+language sql
+stable
+as $$
+    select
+        coalesce(case p_entity
+            when 'contracts' then r->>'title'
+            when 'invoices' then 'Invoice ' || coalesce(r->>'due_date', '')
+            else r->>'name'
+        end, ''),
+        coalesce(case p_entity
+            when 'customers' then concat_ws(' ', r->>'company', r->>'email')
+            when 'crm_contacts' then concat_ws(' ', r->>'company', r->>'email', r->>'lead_status')
+            when 'contracts' then concat_ws(' ', r->>'contract_type', r->>'status')
+            when 'employees' then r->>'position'
+            when 'invoices' then concat_ws(' ', r->>'status', r->>'amount')
+        end, ''),
+        coalesce(case p_entity
+            when 'customers' then concat_ws(' ', r->>'email', r->>'phone')
+            when 'crm_contacts' then concat_ws(' ', r->>'email', r->>'phone', r->>'source')
+            when 'projects' then r->>'description'
+            when 'contracts' then concat_ws(' ', r->>'description', r->>'terms')
+            when 'invoices' then concat_ws(' ', r->>'notes', r->>'payment_method')
+        end, '');
+$$;
+
+create or replace function search_index_sync()
+returns trigger
+language plpgsql
+as $$
+declare
+    r jsonb;
+begin
+    if tg_op = 'DELETE' then
+        delete from search_index where entity = tg_table_name and entity_id = old.id::text;
+        return old;
+    end if;
+
+    r := to_jsonb(new);
+    if r->>'workspace_id' is null then
+        return new;
+    end if;
+    insert into search_index (entity, entity_id, workspace_id, title, subtitle, body, updated_at)
+    select tg_table_name, r->>'id', (r->>'workspace_id')::bigint, d.title, d.subtitle, d.body, now()
+    from search_index_document(tg_table_name, r) d
+    on conflict (entity, entity_id) do update set
+        workspace_id = excluded.workspace_id,
+        title = excluded.title,
+        subtitle = excluded.subtitle,
+        body = excluded.body,
+        updated_at = excluded.updated_at;
+    return new;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['customers', 'crm_contacts', 'projects', 'contracts', 'employees', 'invoices'] loop
+        execute format('drop trigger if exists %I on %I', t || '_search_index', t);
+        execute format(
+            'create trigger %I after insert or update or delete on %I for each row execute function search_index_sync()',
+            t || '_search_index', t
+        );
+        -- Isi awal dari data yang sudah ada
+        execute format(
+            'insert into search_index (entity, entity_id, workspace_id, title, subtitle, body)
+             select %L, s.id::text, s.workspace_id, d.title, d.subtitle, d.body
+             from %I s, search_index_document(%L, to_jsonb(s)) d
+             where s.workspace_id is not null
+             on conflict (entity, entity_id) do nothing',
+            t, t, t
+        );
+    end loop;
+end;
+$$;
+
+-- Satu round trip: hit bertipe (entity) dari semua tabel, diurutkan berdasarkan rank.
+-- p_types null = semua entitas. search_tsquery / search_like_pattern dari migrasi pencarian customer.
+create or replace function search_workspace(
+    p_workspace_id bigint,
+    p_query text,
+    p_prefix boolean default false,
+    p_types text[] default null,
+    p_limit int default 20
+)
+returns table (entity text, entity_id text, title text, subtitle text, rank real)
+language sql
+stable
+as $$
+    with q as (
+        select search_tsquery(p_query, p_prefix) as tsq, lower(trim(p_query)) as term
+    )
+    select
+        s.entity, s.entity_id, s.title, s.subtitle,
+        greatest(ts_rank(s.search_vector, q.tsq), similarity(s.search_text, q.term))::real as rank
+    from search_index s, q
+    where s.workspace_id = p_workspace_id
+      and (p_types is null or s.entity = any(p_types))
+      and (
+          s.search_vector @@ q.tsq
+          or (not p_prefix and length(q.term) >= 3 and s.search_text like search_like_pattern(q.term))
+          or (not p_prefix and s.search_text % q.term)
+      )
+    order by rank desc, s.entity, s.entity_id
+    limit least(greatest(p_limit, 1), 100);
+$$;
@@ -0,0 +1,30 @@
+-- Kunci normalisasi untuk deteksi duplikat customer & kontak CRM.
+-- Harus sama dengan app/core/dedup.py (normalize_email / normalize_phone):
+-- karakter trim email = dedup._TRIM_CHARS, huruf kecil hanya A-Z (tidak bergantung collation).
+alter table customers
+    add column if not exists email_normalized text generated always as (
+        nullif(translate(
+            regexp_replace(coalesce(email, ''), '^[\t\n\v\f\r \u0085\u00a0\u1680\u2000-\u200b\u2028\u2029\u202f\u205f\u3000\ufeff]+|[\t\n\v\f\r \u0085\u00a0\u1680\u2000-\u200b\u2028\u2029\u202f\u205f\u3000\ufeff]+$', '', 'g'),
+            'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'
+        ), '')
+    ) stored,
+    add column if not exists phone_digits text generated always as (
+        nullif(regexp_replace(regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'), '^62', '0'), '')
+    ) stored;
+
+alter table crm_contacts
+    add column if not exists email_normalized text generated always as (
+        nullif(translate(
+            regexp_replace(coalesce(email, ''), '^[\t\n\v\f\r \u0085\u00a0\u1680\u2000-\u200b\u2028\u2029\u202f\u205f\u3000\ufeff]+|[\t\n\v\f\r \u0085\u00a0\u1680\u2000-\u200b\u2028\u2029\u202f\u205f\u3000\ufeff]+$', '', 'g'),
+            'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'
+        ), '')
+    ) stored,
+    add column if not exists phone_digits text generated always as (
+        nullif(regexp_replace(regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'), '^62', '0'), '')
+    ) stored;
+
+-- Cek duplikat saat insert = lookup index, bukan scan
+create index if not exists customers_email_normalized_idx on customers (workspace_id, email_normalized);
+create index if not exists customers_phone_digits_idx on customers (workspace_id, phone_digits);
+create index if not exists crm_contacts_email_normalized_idx on crm_contacts (workspace_id, email_normalized);
+create index if not exists crm_contacts_phone_digits_idx on crm_contacts (workspace_id, phone_digits);
@@ -0,0 +1,12 @@
+-- Rata-rata progress proyek per workspace untuk dashboard analytics.
+-- Aggregate PostgREST (progress.avg()) nonaktif secara default
+-- (pgrst.db_aggregates_enabled), jadi dihitung lewat RPC.
+create or replace function project_progress_avg(p_workspace_id bigint)
+returns table (avg numeric)
+language sql
+stable
+as $$
+    select avg(progress)::numeric
+    from project_analytics
+    where workspace_id = p_workspace_id;
+$$;
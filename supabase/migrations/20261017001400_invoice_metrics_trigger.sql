@@ -0,0 +1,74 @@
+-- Selisih workspace_metrics dari perubahan invoice dihitung di database,
+-- dalam transaksi yang sama dengan insert/update/delete-nya. Sebelumnya handler
+-- membaca baris lama, meng-update, lalu mengirim selisih: dua update bersamaan
+-- bisa membaca status lama yang sama dan menghitung selisihnya dua kali.
+-- Definisi sama dengan reconcile_workspace_metrics(): overdue = status 'overdue'.
+create or replace function invoices_sync_workspace_metrics()
+returns trigger
+language plpgsql
+as $$
+begin
+    -- Update yang tidak menyentuh status/amount (mis. notes) tidak mengubah agregat.
+    -- If terpisah: old_rows tidak ada pada trigger insert, query ini hanya boleh direncanakan saat update
+    if TG_OP = 'UPDATE' then
+        if not exists (
+            select 1
+            from old_rows o
+            join new_rows n using (id)
+            where (o.workspace_id, o.status, o.amount) is distinct from (n.workspace_id, n.status, n.amount)
+        ) then
+            return null;
+        end if;
+    end if;
+
+    -- Satu upsert per workspace per statement (transition table), bukan per baris
+    if TG_OP in ('UPDATE', 'DELETE') then
+        perform increment_workspace_metrics(workspace_id, deltas)
+        from (
+            select workspace_id, jsonb_build_object(
+                'total_invoices', -count(*),
+                'pending_invoices', -count(*) filter (where status = 'pending'),
+                'overdue_invoices', -count(*) filter (where status = 'overdue'),
+                'amount_owed', -coalesce(sum(amount) filter (where status in ('pending', 'overdue')), 0),
+                'amount_paid', -coalesce(sum(amount) filter (where status = 'paid'), 0)
+            ) as deltas
+            from old_rows
+            group by workspace_id
+        ) d;
+    end if;
+    if TG_OP in ('INSERT', 'UPDATE') then
+        perform increment_workspace_metrics(workspace_id, deltas)
+        from (
+            select workspace_id, jsonb_build_object(
+                'total_invoices', count(*),
+                'pending_invoices', count(*) filter (where status = 'pending'),
+                'overdue_invoices', count(*) filter (where status = 'overdue'),
+                'amount_owed', coalesce(sum(amount) filter (where status in ('pending', 'overdue')), 0),
+                'amount_paid', coalesce(sum(amount) filter (where status = 'paid'), 0)
+            ) as deltas
+            from new_rows
+            group by workspace_id
+        ) d;
+    end if;
+    return null;
+end;
+$$;
+
+-- Transition table hanya boleh untuk trigger satu event, jadi dipasang tiga kali
+drop trigger if exists invoices_workspace_metrics_insert on invoices;
+create trigger invoices_workspace_metrics_insert
+    after insert on invoices
+    referencing new table as new_rows
+    for each statement execute function invoices_sync_workspace_metrics();
+
+drop trigger if exists invoices_workspace_metrics_update on invoices;
+create trigger invoices_workspace_metrics_update
+    after update on invoices
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function invoices_sync_workspace_metrics();
+
+drop trigger if exists invoices_workspace_metrics_delete on invoices;
+create trigger invoices_workspace_metrics_delete
+    after delete on invoices
+    referencing old table as old_rows
+    for each statement execute function invoices_sync_workspace_metrics();
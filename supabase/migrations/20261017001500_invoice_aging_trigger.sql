@@ -0,0 +1,45 @@
+-- Selisih invoice_aging dihitung oleh trigger invoices, dalam transaksi yang sama
+-- dengan perubahannya (bukan baca-lalu-update dari handler yang bisa balapan).
+create or replace function invoices_sync_invoice_aging()
+returns trigger
+language plpgsql
+as $$
+begin
+    perform apply_invoice_aging_delta(
+        coalesce(old.workspace_id, new.workspace_id),
+        case when TG_OP in ('UPDATE', 'DELETE') then to_jsonb(old) end,
+        case when TG_OP in ('INSERT', 'UPDATE') then to_jsonb(new) end
+    );
+    return null;
+end;
+$$;
+
+drop trigger if exists invoices_invoice_aging_insert on invoices;
+create trigger invoices_invoice_aging_insert
+    after insert on invoices
+    for each row
+    when (new.status in ('pending', 'overdue'))
+    execute function invoices_sync_invoice_aging();
+
+-- Hanya perubahan yang menggeser bucket / dimensi; pending -> overdue tidak
+-- mengubah aging sehingga flip massal scheduler tidak menulis apa pun
+drop trigger if exists invoices_invoice_aging_update on invoices;
+create trigger invoices_invoice_aging_update
+    after update on invoices
+    for each row
+    when (
+        (old.status in ('pending', 'overdue')) is distinct from (new.status in ('pending', 'overdue'))
+        or (
+            new.status in ('pending', 'overdue')
+            and (old.amount, old.due_date, old.project_id, old.contract_id)
+                is distinct from (new.amount, new.due_date, new.project_id, new.contract_id)
+        )
+    )
+    execute function invoices_sync_invoice_aging();
+
+drop trigger if exists invoices_invoice_aging_delete on invoices;
+create trigger invoices_invoice_aging_delete
+    after delete on invoices
+    for each row
+    when (old.status in ('pending', 'overdue'))
+    execute function invoices_sync_invoice_aging();
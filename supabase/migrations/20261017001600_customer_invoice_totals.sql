@@ -0,0 +1,15 @@
+-- Total invoice per kontrak & status untuk ringkasan customer.
+-- Aggregate embedded PostgREST (amount.sum(), count()) nonaktif secara default
+-- (pgrst.db_aggregates_enabled), jadi dihitung lewat RPC.
+create or replace function customer_invoice_totals(p_workspace_id bigint, p_customer_id text)
+returns table (contract_id text, status text, sum numeric, count bigint)
+language sql
+stable
+as $$
+    select c.id::text, i.status, coalesce(sum(i.amount), 0), count(*)
+    from contracts c
+    join invoices i on i.contract_id = c.id and i.workspace_id = p_workspace_id
+    where c.workspace_id = p_workspace_id
+      and c.customer_id::text = p_customer_id
+    group by c.id, i.status;
+$$;
@@ -0,0 +1,50 @@
+-- Jumlah kontak & opportunity di workspace_metrics dihitung oleh trigger, dalam
+-- transaksi yang sama dengan insert/delete-nya (seperti invoices), bukan RPC
+-- terpisah dari handler yang bisa gagal diam-diam setelah insert berhasil.
+create or replace function crm_sync_workspace_metrics()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_column text := case TG_TABLE_NAME
+        when 'crm_contacts' then 'total_contacts'
+        when 'crm_opportunities' then 'total_opportunities'
+    end;
+begin
+    -- old_rows / new_rows hanya ada sesuai event trigger, jadi query dipisah per cabang
+    if TG_OP = 'INSERT' then
+        perform increment_workspace_metrics(workspace_id, jsonb_build_object(v_column, count(*)))
+        from new_rows
+        group by workspace_id;
+    else
+        perform increment_workspace_metrics(workspace_id, jsonb_build_object(v_column, -count(*)))
+        from old_rows
+        group by workspace_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists crm_contacts_workspace_metrics_insert on crm_contacts;
+create trigger crm_contacts_workspace_metrics_insert
+    after insert on crm_contacts
+    referencing new table as new_rows
+    for each statement execute function crm_sync_workspace_metrics();
+
+drop trigger if exists crm_contacts_workspace_metrics_delete on crm_contacts;
+create trigger crm_contacts_workspace_metrics_delete
+    after delete on crm_contacts
+    referencing old table as old_rows
+    for each statement execute function crm_sync_workspace_metrics();
+
+drop trigger if exists crm_opportunities_workspace_metrics_insert on crm_opportunities;
+create trigger crm_opportunities_workspace_metrics_insert
+    after insert on crm_opportunities
+    referencing new table as new_rows
+    for each statement execute function crm_sync_workspace_metrics();
+
+drop trigger if exists crm_opportunities_workspace_metrics_delete on crm_opportunities;
+create trigger crm_opportunities_workspace_metrics_delete
+    after delete on crm_opportunities
+    referencing old table as old_rows
+    for each statement execute function crm_sync_workspace_metrics();
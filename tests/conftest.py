@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Settings dibaca saat modul app di-import, jadi environment diisi lebih dulu
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
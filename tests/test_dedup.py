@@ -0,0 +1,50 @@
+import re
+from pathlib import Path
+import pytest
+from app.core import dedup
+
+MIGRATION = Path(__file__).parents[1] / "supabase" / "migrations" / "20261017001200_contact_dedup.sql"
+
+def test_generated_column_uses_same_trim_characters():
+    # Kolom generated email_normalized harus memakai daftar karakter yang persis sama
+    sql = MIGRATION.read_text()
+    patterns = re.findall(r"regexp_replace\(coalesce\(email, ''\), '([^']*)'", sql)
+    assert patterns and all(pattern == dedup.EMAIL_TRIM_PATTERN for pattern in patterns)
+    assert sql.count("'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'") == len(patterns)
+
+@pytest.mark.parametrize("raw, expected", [
+    ("  Foo@Bar.COM\t", "foo@bar.com"),
+    (" a@b.co​", "a@b.co"),
+    ("﻿　x@y.id\r\n", "x@y.id"),
+    ("a b@c.d", "a b@c.d"),
+    # Hanya A-Z yang diturunkan, sama seperti translate() di SQL
+    ("İx@Y.z", "İx@y.z"),
+    (" \t", None),
+    (None, None),
+])
+def test_normalize_email(raw, expected):
+    assert dedup.normalize_email(raw) == expected
+
+@pytest.mark.parametrize("raw, expected", [
+    ("+62 812-3456", "08123456"),
+    ("0812 3456", "08123456"),
+    ("-", None),
+    (None, None),
+])
+def test_normalize_phone(raw, expected):
+    assert dedup.normalize_phone(raw) == expected
+
+def test_match_keys_skip_empty_values():
+    row = {"email": " A@B.C ", "phone": ""}
+    assert dedup.match_keys(row) == [("email", "a@b.c")]
+    assert dedup.match_keys(row, ("phone",)) == []
+
+def test_oversized_buckets_are_reported():
+    records = [
+        dedup.prepare("customers", {"id": index, "name": "Budi Santoso", "email": f"b{index}@gmail.com"})
+        for index in range(5)
+    ]
+    result = dedup.find_duplicates(records, 0.85, 3)
+    assert result["truncated"] is True
+    assert result["truncated_buckets"] == [{"block": "name", "key": ["B300S532"], "records": 5}]
+    assert result["stats"]["skipped_buckets"] == 1
@@ -0,0 +1,55 @@
+import pytest
+from urllib.parse import parse_qs
+from fastapi import HTTPException
+from postgrest import AsyncPostgrestClient
+from app.core.pagination import decode_cursor, encode_cursor, keyset, page
+
+def _params(query) -> dict:
+    # postgrest-py 0.x menyimpan params di builder, versi baru di builder.request
+    params = query.request.params if hasattr(query, "request") else query.params
+    return {key: values[0] for key, values in parse_qs(str(params)).items()}
+
+def _query():
+    return AsyncPostgrestClient("http://localhost/rest/v1").from_("invoices").select("*")
+
+@pytest.mark.parametrize("values", [["2026-01-31", "abc"], [None, "abc"], [10, 42], ["a,b.(c)\"", "x"]])
+def test_cursor_round_trip(values):
+    assert decode_cursor(encode_cursor(values)) == values
+
+@pytest.mark.parametrize("cursor", ["not base64 json!", encode_cursor(["only-one"]), "eyJhIjoxfQ"])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def test_first_page_orders_nulls_last_then_id():
+    params = _params(keyset(_query(), "due_date", None, 10))
+    assert params["order"] == "due_date.asc.nullslast,id.asc"
+    assert params["limit"] == "11"
+
+def test_id_sort_uses_plain_filter():
+    params = _params(keyset(_query(), "id", encode_cursor([5, 5]), 10, desc=True))
+    assert params["id"] == "lt.5"
+    assert params["order"] == "id.desc"
+
+def test_cursor_before_null_tail_includes_null_rows():
+    params = _params(keyset(_query(), "due_date", encode_cursor(["2026-01-31", "abc"]), 10))
+    assert params["or"] == (
+        '(due_date.gt."2026-01-31",and(due_date.eq."2026-01-31",id.gt."abc"),due_date.is.null)'
+    )
+
+def test_cursor_inside_null_tail_continues_by_id():
+    params = _params(keyset(_query(), "due_date", encode_cursor([None, "abc"]), 10, desc=True))
+    assert params["due_date"] == "is.null"
+    assert params["id"] == "lt.abc"
+    assert "or" not in params
+    assert "None" not in str(params)
+
+def test_page_cursor_keeps_null_sort_value():
+    rows = [{"id": "a", "due_date": "2026-01-01"}, {"id": "b", "due_date": None}, {"id": "c", "due_date": None}]
+    result = page(rows, "due_date", 2)
+    assert result["data"] == rows[:2]
+    assert decode_cursor(result["next_cursor"]) == [None, "b"]
+
+def test_last_page_has_no_cursor():
+    assert page([{"id": 1}], "id", 2)["next_cursor"] is None
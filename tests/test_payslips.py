@@ -0,0 +1,29 @@
+import io
+import zipfile
+from app.core.payslips import ZipWriter, render_batch
+
+def _slip(index: int) -> dict:
+    return {
+        "id": index, "employee_id": f"E{index}", "pay_date": "2026-10-01",
+        "gross_salary": 1000, "deductions": 100, "net_salary": 900,
+        "employees": {"name": f"Employee <{index}>"}
+    }
+
+def _archive(entries) -> zipfile.ZipFile:
+    writer = ZipWriter()
+    data = b"".join(writer.entry(*entry) for entry in entries) + writer.finish()
+    return zipfile.ZipFile(io.BytesIO(data))
+
+def test_zip_round_trip():
+    archive = _archive(render_batch([_slip(1), _slip(2)]))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["2026-10-01/E1-1.html", "2026-10-01/E2-2.html"]
+    assert b"Employee &lt;2&gt;" in archive.read("2026-10-01/E2-2.html")
+
+def test_zip64_when_entry_count_exceeds_16_bits():
+    # Entri kosong yang sudah dikompresi: cukup untuk melewati batas 0xFFFF entri
+    empty = render_batch([_slip(0)])[0]
+    count = 0x10000 + 5
+    archive = _archive((f"slip-{index}.html", *empty[1:]) for index in range(count))
+    assert len(archive.infolist()) == count
+    assert archive.read(f"slip-{count - 1}.html") == archive.read("slip-0.html")
@@ -0,0 +1,83 @@
+import asyncio
+from starlette.requests import Request
+from app.core.permissions import memberships
+from app.core.response_cache import ResponseCache, _matches
+
+def _request(path: str, query: str = "", if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({
+        "type": "http", "method": "GET", "path": path,
+        "query_string": query.encode(), "headers": headers
+    })
+
+class Builder:
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.data
+
+def _respond(cache, build, user_id="u1", workspace_id=1, **request):
+    return asyncio.run(cache.respond(
+        _request(**request), None, {"id": user_id}, workspace_id, "invoices", build
+    ))
+
+def setup_function():
+    memberships._cache.clear()
+    memberships._cache.set(("u1", "1"), "member")
+    memberships._cache.set(("u2", "1"), "admin")
+
+def test_matches_if_none_match_forms():
+    assert _matches('"a", W/"b"', '"b"')
+    assert _matches("*", '"x"')
+    assert not _matches('"a"', '"b"')
+    assert not _matches(None, '"b"')
+
+def test_hit_serves_stored_body_and_304_on_etag():
+    cache, build = ResponseCache(100, 60), Builder([{"id": 1}])
+    first = _respond(cache, build, path="/workspaces/1/invoices")
+    assert first.status_code == 200 and first.body == b'[{"id":1}]'
+    etag = first.headers["etag"]
+
+    again = _respond(cache, build, path="/workspaces/1/invoices")
+    not_modified = _respond(cache, build, path="/workspaces/1/invoices", if_none_match=etag)
+    assert again.body == first.body and again.headers["etag"] == etag
+    assert not_modified.status_code == 304 and not_modified.body == b""
+    assert build.calls == 1
+    assert cache.stats()["not_modified"] == 1
+
+def test_key_includes_query_role_and_workspace():
+    cache, build = ResponseCache(100, 60), Builder([])
+    _respond(cache, build, path="/workspaces/1/invoices", query="status=paid&limit=5")
+    # Urutan query string tidak membuat key baru
+    _respond(cache, build, path="/workspaces/1/invoices", query="limit=5&status=paid")
+    assert build.calls == 1
+    _respond(cache, build, path="/workspaces/1/invoices", query="status=pending")
+    _respond(cache, build, user_id="u2", path="/workspaces/1/invoices", query="status=paid&limit=5")
+    assert build.calls == 3
+
+def test_bump_invalidates_workspace_resource():
+    cache, build = ResponseCache(100, 60), Builder([])
+    _respond(cache, build, path="/workspaces/1/invoices")
+    cache.bump(2, "invoices")
+    cache.bump(1, "contracts")
+    _respond(cache, build, path="/workspaces/1/invoices")
+    assert build.calls == 1
+    cache.bump(1, "invoices")
+    _respond(cache, build, path="/workspaces/1/invoices")
+    assert build.calls == 2
+
+def test_write_during_build_is_not_cached():
+    cache = ResponseCache(100, 60)
+    calls = []
+
+    async def build():
+        calls.append(1)
+        cache.bump(1, "invoices")
+        return []
+
+    _respond(cache, build, path="/workspaces/1/invoices")
+    _respond(cache, build, path="/workspaces/1/invoices")
+    assert len(calls) == 2